@@ -10,6 +10,12 @@ function Nav() {
         <Link href="/admin/logs" className="text-blue-600 hover:text-blue-800">
           Logs
         </Link>
+        <Link
+          href="/admin/analytics"
+          className="text-blue-600 hover:text-blue-800"
+        >
+          Analytics
+        </Link>
         <Link
           href="/admin/manageUsers"
           className="text-blue-600 hover:text-blue-800"
@@ -0,0 +1,195 @@
+"use client";
+
+import React, { useEffect, useState } from "react";
+import axios from "axios";
+import { useAuth } from "../../context/AuthContext";
+
+interface Counters {
+  attempts?: number;
+  authorized?: number;
+  denied?: number;
+  confidence_histogram?: Record<string, number>;
+}
+
+interface HourCounters extends Counters {
+  hour: string;
+}
+
+interface UserCounters extends Counters {
+  user_email: string;
+  last_attempt_at?: string;
+}
+
+interface AuthorizationAnalytics {
+  totals: Counters;
+  hourly: HourCounters[];
+  users: UserCounters[];
+}
+
+const successRate = (counters: Counters) =>
+  counters.attempts
+    ? `${((100 * (counters.authorized || 0)) / counters.attempts).toFixed(1)}%`
+    : "-";
+
+const AnalyticsPage = () => {
+  const { user } = useAuth();
+  const [analytics, setAnalytics] = useState<AuthorizationAnalytics | null>(
+    null
+  );
+  const [hours, setHours] = useState(24);
+  const [loading, setLoading] = useState(false);
+
+  // Counters are maintained by the server as decisions are logged
+  const fetchAnalytics = async (range = hours) => {
+    setLoading(true);
+    try {
+      const until = new Date();
+      const since = new Date(until.getTime() - range * 60 * 60 * 1000);
+      const token = await user?.getIdToken();
+      const response = await axios.get<AuthorizationAnalytics>(
+        "http://localhost:5000/admin/authorization_analytics",
+        {
+          params: { since: since.toISOString(), until: until.toISOString() },
+          headers: {
+            Authorization: `Bearer ${token}`,
+          },
+        }
+      );
+      setAnalytics(response.data);
+    } catch (error) {
+      console.error("Error fetching analytics:", error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    if (user) fetchAnalytics();
+  }, [user]);
+
+  const totals = analytics?.totals || {};
+  const histogram = totals.confidence_histogram || {};
+  const histogramMax = Math.max(1, ...Object.values(histogram));
+
+  return (
+    <div className="container mx-auto px-4 py-6">
+      <h1 className="text-3xl font-bold mb-6 text-gray-800">
+        Authorization Analytics
+      </h1>
+
+      <div className="flex items-center gap-4 mb-4">
+        <select
+          value={hours}
+          onChange={(e) => {
+            setHours(Number(e.target.value));
+            fetchAnalytics(Number(e.target.value));
+          }}
+          className="w-1/4 px-4 py-2 border border-gray-300 rounded-md focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
+        >
+          <option value={24}>Last 24 hours</option>
+          <option value={24 * 7}>Last 7 days</option>
+          <option value={24 * 30}>Last 30 days</option>
+        </select>
+        {loading && (
+          <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-blue-500"></div>
+        )}
+      </div>
+
+      {/* Totals */}
+      <div className="grid grid-cols-4 gap-4 mb-6">
+        {[
+          ["Attempts", totals.attempts || 0],
+          ["Authorized", totals.authorized || 0],
+          ["Denied", totals.denied || 0],
+          ["Success rate", successRate(totals)],
+        ].map(([label, value]) => (
+          <div key={label} className="bg-white shadow-md rounded-lg p-4">
+            <div className="text-sm text-gray-500">{label}</div>
+            <div className="text-2xl font-semibold">{value}</div>
+          </div>
+        ))}
+      </div>
+
+      {/* Confidence histogram */}
+      <div className="bg-white shadow-md rounded-lg p-4 mb-6">
+        <h2 className="text-lg font-semibold mb-2">Confidence</h2>
+        {Object.keys(histogram)
+          .sort()
+          .map((bucket) => (
+            <div key={bucket} className="flex items-center gap-2 text-sm">
+              <span className="w-16">{Number(bucket.slice(1))}%+</span>
+              <div
+                className="bg-blue-500 h-3 rounded"
+                style={{ width: `${(70 * histogram[bucket]) / histogramMax}%` }}
+              ></div>
+              <span>{histogram[bucket]}</span>
+            </div>
+          ))}
+      </div>
+
+      {/* Hourly */}
+      <div className="bg-white shadow-md rounded-lg overflow-hidden mb-6">
+        <table className="w-full text-left text-sm">
+          <thead className="bg-gray-50 text-gray-700 uppercase">
+            <tr>
+              <th className="px-4 py-3">Hour (UTC)</th>
+              <th className="px-4 py-3">Attempts</th>
+              <th className="px-4 py-3">Authorized</th>
+              <th className="px-4 py-3">Denied</th>
+              <th className="px-4 py-3">Success Rate</th>
+            </tr>
+          </thead>
+          <tbody className="divide-y divide-gray-200">
+            {(analytics?.hourly || []).length === 0 ? (
+              <tr>
+                <td colSpan={5} className="text-center py-4 text-gray-500">
+                  No attempts in this range
+                </td>
+              </tr>
+            ) : (
+              analytics!.hourly.map((hour) => (
+                <tr key={hour.hour} className="hover:bg-gray-50">
+                  <td className="px-4 py-3">{hour.hour.replace("T", " ")}:00</td>
+                  <td className="px-4 py-3">{hour.attempts || 0}</td>
+                  <td className="px-4 py-3">{hour.authorized || 0}</td>
+                  <td className="px-4 py-3">{hour.denied || 0}</td>
+                  <td className="px-4 py-3">{successRate(hour)}</td>
+                </tr>
+              ))
+            )}
+          </tbody>
+        </table>
+      </div>
+
+      {/* Users */}
+      <div className="bg-white shadow-md rounded-lg overflow-hidden">
+        <table className="w-full text-left text-sm">
+          <thead className="bg-gray-50 text-gray-700 uppercase">
+            <tr>
+              <th className="px-4 py-3">User Email</th>
+              <th className="px-4 py-3">Attempts</th>
+              <th className="px-4 py-3">Success Rate</th>
+              <th className="px-4 py-3">Last Attempt</th>
+            </tr>
+          </thead>
+          <tbody className="divide-y divide-gray-200">
+            {(analytics?.users || []).map((user) => (
+              <tr key={user.user_email} className="hover:bg-gray-50">
+                <td className="px-4 py-3">{user.user_email}</td>
+                <td className="px-4 py-3">{user.attempts || 0}</td>
+                <td className="px-4 py-3">{successRate(user)}</td>
+                <td className="px-4 py-3">
+                  {user.last_attempt_at
+                    ? new Date(user.last_attempt_at).toLocaleString()
+                    : "-"}
+                </td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      </div>
+    </div>
+  );
+};
+
+export default AnalyticsPage;
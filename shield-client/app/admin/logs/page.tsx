@@ -2,6 +2,7 @@
 
 import React, { useEffect, useState } from "react";
 import axios from "axios";
+import { useAuth } from "../../context/AuthContext";
 
 interface AuthorizationLog {
   id: string;
@@ -13,30 +14,49 @@ interface AuthorizationLog {
   user_email: string;
 }
 
+interface AuthorizationLogPage {
+  logs: AuthorizationLog[];
+  nextCursor: string | null;
+}
+
 const LogsPage = () => {
-  const [logs, setLogs] = useState<AuthorizationLog[]>([]);
+  const { user } = useAuth();
+  const [currentLogs, setCurrentLogs] = useState<AuthorizationLog[]>([]);
   const [currentPage, setCurrentPage] = useState(1);
+  // cursors[i] fetches page i + 1; the server pages by cursor, not by offset
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [searchEmail, setSearchEmail] = useState("");
   const [filterAuthorized, setFilterAuthorized] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
 
   const logsPerPage = 10;
 
-  // Fetch logs from the backend
-  const fetchLogs = async (email = "", authorized: string | null = null) => {
+  // Fetch one page of logs from the backend
+  const fetchLogs = async (
+    cursor: string | null = null,
+    email = searchEmail,
+    authorized: string | null = filterAuthorized
+  ) => {
     setLoading(true);
     try {
-      const params: any = {};
+      const params: any = { limit: logsPerPage };
       if (email) params.email = email;
       if (authorized !== null) params.authorized = authorized;
+      if (cursor) params.cursor = cursor;
 
-      const response = await axios.get(
+      const token = await user?.getIdToken();
+      const response = await axios.get<AuthorizationLogPage>(
         "http://localhost:5000/admin/authorization_logs",
         {
           params,
+          headers: {
+            Authorization: `Bearer ${token}`,
+          },
         }
       );
-      setLogs(response.data);
+      setCurrentLogs(response.data.logs);
+      setNextCursor(response.data.nextCursor);
     } catch (error) {
       console.error("Error fetching logs:", error);
     } finally {
@@ -45,24 +65,25 @@ const LogsPage = () => {
   };
 
   useEffect(() => {
-    fetchLogs();
-  }, []);
-
-  // Pagination logic
-  const indexOfLastLog = currentPage * logsPerPage;
-  const indexOfFirstLog = indexOfLastLog - logsPerPage;
-  const currentLogs = logs.slice(indexOfFirstLog, indexOfLastLog);
-  const totalPages = Math.ceil(logs.length / logsPerPage);
+    if (user) fetchLogs();
+  }, [user]);
 
   const handlePageChange = (page: number) => {
-    if (page > 0 && page <= totalPages) {
-      setCurrentPage(page);
+    if (page < 1) return;
+    if (page > currentPage) {
+      if (!nextCursor) return;
+      setCursors([...cursors.slice(0, currentPage), nextCursor]);
+      fetchLogs(nextCursor);
+    } else {
+      fetchLogs(cursors[page - 1]);
     }
+    setCurrentPage(page);
   };
 
   // Search and filter handler
   const handleSearch = () => {
-    fetchLogs(searchEmail, filterAuthorized);
+    fetchLogs(null, searchEmail, filterAuthorized);
+    setCursors([null]);
     setCurrentPage(1); // Reset to first page after filtering
   };
 
@@ -166,12 +187,10 @@ const LogsPage = () => {
         >
           Previous
         </button>
-        <span>
-          Page {currentPage} of {totalPages}
-        </span>
+        <span>Page {currentPage}</span>
         <button
           onClick={() => handlePageChange(currentPage + 1)}
-          disabled={currentPage === totalPages}
+          disabled={!nextCursor}
           className="px-4 py-2 bg-gray-200 text-gray-600 rounded-md hover:bg-gray-300 disabled:opacity-50"
         >
           Next
@@ -41,6 +41,11 @@ const CameraComponent = () => {
         }
       });
 
+      // Frames without exactly one usable face, or rejected by the quality gate
+      newSocket.on("frame_error", (data) => {
+        setStatus(data.message);
+      });
+
       newSocket.on("capture_completed", (data) => {
         setStatus(data.status);
         setDetectedFaces([]);
@@ -50,6 +55,16 @@ const CameraComponent = () => {
         }
       });
 
+      // Training runs as a background job on the server
+      newSocket.on("training_progress", (data) => {
+        setStatus(`Training: ${data.stage.replace(/_/g, " ")}...`);
+        setProgress(data.progress);
+      });
+
+      newSocket.on("training_error", (data) => {
+        setStatus(`${data.status}: ${data.error}`);
+      });
+
       newSocket.on("training_completed", (data) => {
         setStatus("Training Completed! You can now access the secure route.");
         updateUserDetails({ isFaceTrained: true });
@@ -130,12 +145,15 @@ const CameraComponent = () => {
     captureIntervalRef.current = setInterval(() => {
       // Draw the video frame onto the canvas
       context.drawImage(video, 0, 0, canvas.width, canvas.height);
-      const imageData = canvas.toDataURL("image/jpeg");
 
-      socket?.emit("upload_image", {
-        image: imageData,
-        face_id: id,
-      });
+      // Send raw JPEG bytes as a binary attachment rather than a base64 data URL
+      canvas.toBlob(async (blob) => {
+        if (!blob) return;
+        socket?.emit("upload_image", {
+          image: await blob.arrayBuffer(),
+          face_id: id,
+        });
+      }, "image/jpeg");
     }, 100);
   };
 
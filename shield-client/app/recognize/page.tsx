@@ -23,6 +23,10 @@ interface RecognizedFace {
 interface RecognitionResult {
   faces: RecognizedFace[];
   status: string;
+  frameId?: number;
+  sentAt?: number;
+  serverLatencyMs?: number;
+  modelVersion?: number;
 }
 
 interface FinalAuthorization {
@@ -31,8 +35,13 @@ interface FinalAuthorization {
   confidence?: number;
   reason?: string;
   error?: string;
+  attemptId?: string;
+  decidedBy?: string;
+  framesEvaluated?: number;
+  timeToDecisionMs?: number;
 }
 
+// Upper bound only: the server decides as soon as enough frames agree
 const RECOGNITION_DURATION = 5000;
 const CAPTURE_INTERVAL = 500;
 const CONFIDENCE_THRESHOLD = 60;
@@ -50,12 +59,17 @@ const RecognitionComponent: React.FC = () => {
   const canvasRef = useRef<HTMLCanvasElement>(null);
   const socketRef = useRef<Socket | null>(null);
   const streamRef = useRef<MediaStream | null>(null);
+  const frameIdRef = useRef<number>(0);
+  const attemptIdRef = useRef<string | null>(null);
+  const captureIntervalRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  const captureTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null);
 
   const [recognizedFaces, setRecognizedFaces] = useState<RecognizedFace[]>([]);
   const [isRecognizing, setIsRecognizing] = useState<boolean>(false);
   const [showModal, setShowModal] = useState<boolean>(false);
   const [error, setError] = useState<string>("");
   const [isInitialized, setIsInitialized] = useState<boolean>(false);
+  const [latencyMs, setLatencyMs] = useState<number | null>(null);
   const [authState, setAuthState] = useState<FinalAuthorization>({
     status: "",
     recognizedAs: "",
@@ -112,9 +126,30 @@ const RecognitionComponent: React.FC = () => {
 
   const handleRecognitionResult = (data: RecognitionResult) => {
     setRecognizedFaces(data.faces);
+    // The server only answers the newest frame, so this stays bounded
+    // even when frames are sent faster than they can be processed.
+    if (data.sentAt) {
+      setLatencyMs(Date.now() - data.sentAt);
+    }
+  };
+
+  const stopCapture = () => {
+    if (captureIntervalRef.current) clearInterval(captureIntervalRef.current);
+    if (captureTimeoutRef.current) clearTimeout(captureTimeoutRef.current);
+    captureIntervalRef.current = null;
+    captureTimeoutRef.current = null;
+    setIsRecognizing(false);
   };
 
   const handleFinalAuthorization = (data: FinalAuthorization) => {
+    // Ignore decisions of an earlier attempt
+    if (data.attemptId && data.attemptId !== attemptIdRef.current) return;
+    stopCapture();
+    if (data.timeToDecisionMs !== undefined) {
+      console.log(
+        `Decision after ${data.framesEvaluated} frames, ${data.timeToDecisionMs} ms (${data.decidedBy})`
+      );
+    }
     setAuthState(data);
     // setAuthState({ status: "Authorized" });
     setShowModal(true);
@@ -231,7 +266,9 @@ const RecognitionComponent: React.FC = () => {
     };
   }, [recognizedFaces, isRecognizing, isInitialized]);
 
-  const captureFrame = (): string | null => {
+  // Frames are sent as raw JPEG bytes (a binary Socket.IO attachment)
+  // instead of a base64 data URL, which is ~33% larger on the wire.
+  const captureFrame = async (): Promise<ArrayBuffer | null> => {
     const video = videoRef.current;
     const canvas = canvasRef.current;
     if (!video || !canvas || video.readyState !== video.HAVE_ENOUGH_DATA) {
@@ -242,7 +279,10 @@ const RecognitionComponent: React.FC = () => {
     if (!context) return null;
 
     context.drawImage(video, 0, 0, VIDEO_WIDTH, VIDEO_HEIGHT);
-    return canvas.toDataURL("image/jpeg", 0.8);
+    const blob = await new Promise<Blob | null>((resolve) =>
+      canvas.toBlob(resolve, "image/jpeg", 0.8)
+    );
+    return blob ? blob.arrayBuffer() : null;
   };
 
   const startRecognition = () => {
@@ -256,20 +296,27 @@ const RecognitionComponent: React.FC = () => {
     setRecognizedFaces([]);
     setIsRecognizing(true);
 
-    const captureInterval = setInterval(() => {
-      const imageData = captureFrame();
-      if (imageData) {
-        socket.emit("recognize_face", { image: imageData, username: id });
+    // The server keeps the attempt's results and decides; frames only carry its id
+    const attemptId = crypto.randomUUID();
+    attemptIdRef.current = attemptId;
+
+    captureIntervalRef.current = setInterval(async () => {
+      const imageData = await captureFrame();
+      if (imageData && attemptIdRef.current === attemptId) {
+        socket.emit("recognize_face", {
+          image: imageData,
+          username: id,
+          attemptId,
+          frameId: ++frameIdRef.current,
+          sentAt: Date.now(),
+        });
       }
     }, CAPTURE_INTERVAL);
 
-    setTimeout(() => {
-      clearInterval(captureInterval);
-      socket.emit("get_final_authorization", {
-        recognizedFaces,
-        username: id,
-      });
-      setIsRecognizing(false);
+    // No decision yet: ask the server to close the attempt
+    captureTimeoutRef.current = setTimeout(() => {
+      if (captureIntervalRef.current) clearInterval(captureIntervalRef.current);
+      socket.emit("get_final_authorization", { attemptId, username: id });
     }, RECOGNITION_DURATION);
   };
 
@@ -282,11 +329,6 @@ const RecognitionComponent: React.FC = () => {
         const token = await user?.getIdToken(true);
         const userId = userDetails?.id;
 
-        updateUserDetails({ canAccessSecureRoute: true });
-        // Revert access after 30 seconds
-        setTimeout(() => {
-          updateUserDetails({ canAccessSecureRoute: false });
-        }, 30000); // 30 seconds
         const response = await axios.patch(
           `http://localhost:5000/set_secure_access/${userId}`,
           {},
@@ -297,7 +339,13 @@ const RecognitionComponent: React.FC = () => {
           }
         );
 
-        // Temporarily allow secure access
+        // Temporarily allow secure access, until the expiry the server stored
+        updateUserDetails({ canAccessSecureRoute: true });
+        const expiresIn =
+          new Date(response.data.accessExpiresAt).getTime() - Date.now();
+        setTimeout(() => {
+          updateUserDetails({ canAccessSecureRoute: false });
+        }, Math.max(expiresIn, 0));
 
         console.log("API Response:", response.data);
 
@@ -342,6 +390,12 @@ const RecognitionComponent: React.FC = () => {
         />
       </div>
 
+      {isRecognizing && latencyMs !== null && (
+        <p className="text-sm text-gray-500">
+          Frame-to-result latency: {latencyMs} ms
+        </p>
+      )}
+
       <button
         onClick={startRecognition}
         disabled={isRecognizing || !id || !isInitialized}
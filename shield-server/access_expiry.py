@@ -0,0 +1,137 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def has_secure_access(user, now=None):
+    """True if the user holds a secure-route grant that has not expired yet.
+
+    A grant whose `accessExpiresAt` has passed counts as revoked even if the
+    scheduler has not cleared `canAccessSecureRoute` yet.
+    """
+    expires_at = user.get('accessExpiresAt')
+    if not user.get('canAccessSecureRoute') or expires_at is None:
+        return False
+    return expires_at > (now or datetime.now(timezone.utc))
+
+
+class AccessExpiry:
+    """Timed secure-route grants, revoked by one scheduler thread.
+
+    Each grant stores `canAccessSecureRoute` and its `accessExpiresAt` on the
+    user document and pushes the deadline on a heap. The thread sleeps until
+    the earliest deadline, then clears every grant that is due in one
+    batched write, conditioned on each stored deadline still being due. A
+    re-grant only pushes a new deadline; the superseded one is skipped when
+    it comes up, and a re-grant racing with the revocation is kept. On
+    start, grants that expired while the server was down are revoked and the
+    others are scheduled again.
+    """
+
+    def __init__(self):
+        self._users = None
+        self._thread = None
+        self._heap = []
+        # user id -> latest expiry; heap entries that don't match it are stale
+        self._deadlines = {}
+        self._wakeup = threading.Condition()
+        self._stats = {'granted': 0, 'revoked': 0, 'reconciled': 0, 'superseded': 0, 'renewed': 0, 'revoke_errors': 0}
+
+    def start(self, users):
+        self._users = users
+        if self._thread is None:
+            try:
+                self.reconcile()
+            except Exception as e:
+                # Expired grants still read as revoked; they are cleared on the next start
+                logger.error(f"Error reconciling secure access grants: {str(e)}")
+            self._thread = threading.Thread(target=self._run, name='access-expiry', daemon=True)
+            self._thread.start()
+
+    def grant(self, user_id, seconds):
+        """Allow the user on the secure route for `seconds`; return when the grant expires."""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+        self._users.update(user_id, {
+            'canAccessSecureRoute': True,
+            'accessExpiresAt': expires_at,
+        })
+        self._schedule(user_id, expires_at)
+        with self._wakeup:
+            self._stats['granted'] += 1
+        return expires_at
+
+    def _schedule(self, user_id, expires_at):
+        with self._wakeup:
+            self._deadlines[user_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, user_id))
+            # Wake the thread in case this deadline is now the earliest
+            self._wakeup.notify()
+
+    def reconcile(self):
+        """Revoke grants that expired while nobody was watching and schedule the rest."""
+        now = datetime.now(timezone.utc)
+        expired = []
+        for user in self._users.with_secure_access():
+            expires_at = user.get('accessExpiresAt')
+            # Grants from before expiries were stored never expire on their own
+            if expires_at is None or expires_at <= now:
+                expired.append(user['id'])
+            else:
+                self._schedule(user['id'], expires_at)
+        self._revoke(expired, now)
+        with self._wakeup:
+            self._stats['reconciled'] += len(expired)
+        if expired:
+            logger.info(f"Revoked {len(expired)} secure access grants that expired while the server was down")
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._heap or self._heap[0][0] > datetime.now(timezone.utc):
+                    timeout = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds() if self._heap else None
+                    self._wakeup.wait(timeout)
+
+                # Take every deadline that is due, dropping superseded ones
+                now = datetime.now(timezone.utc)
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    expires_at, user_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(user_id) == expires_at:
+                        del self._deadlines[user_id]
+                        due.append(user_id)
+                    else:
+                        self._stats['superseded'] += 1
+            self._revoke(due, now)
+
+    def _revoke(self, user_ids, now):
+        if not user_ids:
+            return
+        try:
+            # Only grants whose stored deadline is still due by `now`: one
+            # renewed since it was taken off the heap (here or by another
+            # server) is kept, and users deleted meanwhile are skipped
+            revoked = self._users.revoke_expired_access(user_ids, now)
+        except Exception as e:
+            # Readers already treat these grants as expired; the next start retries
+            logger.error(f"Error revoking {len(user_ids)} secure access grants: {str(e)}")
+            with self._wakeup:
+                self._stats['revoke_errors'] += len(user_ids)
+            return
+        with self._wakeup:
+            self._stats['revoked'] += revoked
+            self._stats['renewed'] += len(user_ids) - revoked
+
+    def stats(self):
+        with self._wakeup:
+            stats = dict(self._stats)
+            stats['scheduled'] = len(self._deadlines)
+            stats['next_expiry_s'] = (
+                round((self._heap[0][0] - datetime.now(timezone.utc)).total_seconds(), 1) if self._heap else None
+            )
+        return stats
+
+
+access_expiry = AccessExpiry()
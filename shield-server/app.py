@@ -1,17 +1,35 @@
 from flask import Flask,request,jsonify
 from flask_socketio import SocketIO, emit,disconnect
 import cv2
-import numpy as np
-import base64
 import os
 from flask_cors import CORS
 from PIL import Image
-import pickle
 from firebase_admin import auth, firestore
 from functools import wraps
 import logging
-from firebase_service import db
+from storage import storage
+from socket_sessions import socket_sessions
+import auth_service
+from frame_pipeline import FACE_SIZE, Frame, normalize_face, transport_stats
+import config
+from frame_workers import FrameWorkerPool
+from face_tracker import FaceTracker, tracking_stats
+from lbph import spatial_histogram
+import face_model
+from training_jobs import training_jobs
+from capture_buffer import CaptureBuffers
+from authorization_window import AuthorizationAttempts
+from audit_writer import audit_writer
+from user_directory import user_directory
+from access_expiry import access_expiry
+import user_logins
+from user_logins import login_stats
+import authorization_analytics
+import frame_quality
+from frame_quality import QualityGate, REJECTION_MESSAGES
+import face_dataset
 from firebase_admin.firestore import FieldFilter,SERVER_TIMESTAMP
+import threading
 import time
 
 app = Flask(__name__)
@@ -43,43 +61,57 @@ from routes.users import users_bp
 app.register_blueprint(users_bp)
 from routes.authorization_logs import admin_bp
 app.register_blueprint(admin_bp)
+from routes.training import training_bp
+app.register_blueprint(training_bp)
 
 # Ensure the dataset and trainer directories exist
 for dir in ['dataset', 'trainer']:
     if not os.path.exists(dir):
         os.makedirs(dir)
 
-# Dictionary to track frames per user
-user_frame_count = {}
+# Enrollment crops of each capture session, until training takes them
+capture_buffers = CaptureBuffers(
+    capacity=config.ENROLL_FRAMES,
+    gate=QualityGate(
+        min_sharpness=config.ENROLL_MIN_SHARPNESS,
+        brightness_range=(config.ENROLL_MIN_BRIGHTNESS, config.ENROLL_MAX_BRIGHTNESS),
+        duplicate_distance=config.ENROLL_DUPLICATE_DISTANCE,
+        diverse_distance=config.ENROLL_DIVERSE_DISTANCE,
+        diversity_target=config.ENROLL_DIVERSITY_TARGET,
+        min_frames=config.ENROLL_MIN_FRAMES
+    ) if config.ENROLL_QUALITY_GATE else None
+)
 
-face_detector = cv2.CascadeClassifier('./haarcascade_frontalface_default.xml')
+# CPU-heavy frame processing runs here, not in the socket handlers
+frame_pool = FrameWorkerPool(config.FRAME_WORKERS, config.FRAME_QUEUE_DEPTH, config.FRAME_QUEUE_POLICY)
 
-# Use LBPH Face Recognizer for better performance with incremental learning
-recognizer = cv2.face.LBPHFaceRecognizer_create()
+# Open authorization attempt of each session
+authorization_attempts = AuthorizationAttempts(
+    window=config.AUTH_WINDOW_FRAMES,
+    required=config.AUTH_REQUIRED_FRAMES,
+    min_confidence=config.AUTH_MIN_CONFIDENCE,
+    timeout=config.AUTH_ATTEMPT_TIMEOUT
+)
 
-# Global variable to store user IDs and names
-user_data = {}
-filename=None
+# Face trackers per (sid, event) stream
+face_trackers = {}
 
+# sids of connected clients; frame jobs of a closed session are dropped
+connected_sids = set()
 
+# detectMultiScale is not safe to call concurrently on one classifier, so
+# every thread (frame workers, the training worker) loads its own
+_detectors = threading.local()
+
+def get_face_detector():
+    """Return the calling thread's face detector, loading it on first use."""
+    detector = getattr(_detectors, 'classifier', None)
+    if detector is None:
+        detector = _detectors.classifier = cv2.CascadeClassifier('./haarcascade_frontalface_default.xml')
+    return detector
+
+filename=None
 
-def verify_token(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(' ')[1]
-        
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            decoded_token = auth.verify_id_token(token)
-            return f(decoded_token, *args, **kwargs)
-        except Exception as e:
-            return jsonify({'message': 'Invalid token'}), 401
-    
-    return decorated_function
 
 
 @app.route('/verify-user', methods=['POST'])
@@ -94,15 +126,21 @@ def verify_user():
 
     try:
         # Verify the Firebase token
-        decoded_token = auth.verify_id_token(data['token'])
+        decoded_token = auth_service.verify_id_token(data['token'])
         user_email = decoded_token['email']
         firebase_uid = decoded_token['uid']
 
-        # Check if the user exists in Firestore
-        users_ref = db.collection('users')
-        user_doc = users_ref.where('email', '==', user_email).limit(1).get()
-
-        if not len(user_doc):
+        # Find the user in the users mirror: by uid once the document has been
+        # moved under it, by email before the first login
+        started = time.perf_counter()
+        mirrored = user_directory.is_current(doc_id=firebase_uid, email=user_email)
+        user_data = user_directory.by_uid(firebase_uid)
+        lookups = 1
+        if user_data is None or user_data.get('email') != user_email:
+            user_data = user_directory.by_email(user_email)
+            lookups += 1
+
+        if user_data is None:
             # If user doesn't exist in Firestore, return detailed error
             return jsonify({
                 'authorized': False,
@@ -110,26 +148,22 @@ def verify_user():
                 'message': 'User does not exist in our system. Please contact support.'
             }), 404
 
-        # If user exists, retrieve user data
-        user_data = user_doc[0].to_dict()
-
-        # Get the Firestore document reference and ID
-        old_user_ref = user_doc[0].reference
-        old_user_id = user_doc[0].id
+        # Mark the user validated, refresh the profile and key the document by
+        # the Firebase UID, in at most one commit (none if nothing changed)
+        writes = 0
+        if user_logins.needs_write(user_data, decoded_token):
+            with user_directory.writing(user_data['id'], firebase_uid, email=user_email):
+                writes = user_logins.record_login(storage.users, user_data, decoded_token)
+        login_stats.record(writes, writes + (0 if mirrored else lookups), time.perf_counter() - started)
+        if user_data['id'] != firebase_uid:
+            # The user's document ID changed, so cached tokens are stale
+            auth_service.invalidate_user(email=user_email, uid=firebase_uid)
 
-        # Update Firestore document fields
-        old_user_ref.update({
-            'isValidated': True,
-            'name': decoded_token.get('name', user_data.get('name', '')),
-            'photoURL': decoded_token.get('picture', user_data.get('photoURL', '')),
-            'updatedAt': firestore.SERVER_TIMESTAMP
-        })
-         
         # Handle first-time login and custom claims setup
         if not user_data.get('isValidated', False):
             # Set custom claims for the user in Firebase Authentication
             user_role = user_data.get('role', 'user')
-            auth.set_custom_user_claims(firebase_uid, {'role': user_role})
+            auth_service.set_role_claim(firebase_uid, user_role)
             
             return jsonify({
                 'authorized': False,
@@ -138,21 +172,6 @@ def verify_user():
                 'role': user_role
             }), 401  # Changed to 401 to indicate authentication needs to be redone
 
-        # Sync Firestore document ID with Firebase UID
-        if old_user_id != firebase_uid:
-            # Create a new document with Firebase UID as the document ID
-            new_user_ref = users_ref.document(firebase_uid)
-
-            # Copy all the data from the old document to the new one
-            new_user_ref.set({
-                **user_data,
-                'uid': firebase_uid,
-                'id': firebase_uid
-            })
-
-            # Delete the old document to avoid duplication
-            old_user_ref.delete()
-
         return jsonify({
             'authorized': True,
             'role': user_data.get('role', 'user'),
@@ -172,476 +191,521 @@ def verify_user():
             'message': 'An unexpected error occurred. Please try again later.'
         }), 500
         
-def authenticated_only(f):
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose in-process counters for auth, frame transport and the worker pool."""
+    return jsonify({
+        'auth_cache': auth_service.cache_stats(),
+        'socket_sessions': socket_sessions.stats,
+        'frame_transport': transport_stats.snapshot(),
+        'frame_pool': frame_pool.stats(),
+        'face_tracking': tracking_stats.snapshot(),
+        'enrollment_capture': capture_buffers.stats(),
+        'training_jobs': training_jobs.stats(),
+        'authorization': authorization_attempts.stats(),
+        'audit_writer': audit_writer.stats(),
+        'user_directory': user_directory.stats(),
+        'logins': login_stats.stats(),
+        'secure_access': access_expiry.stats(),
+        'storage': storage.stats(),
+    })
+
+def authenticated_only_socketio(f):
     @wraps(f)
     def wrapped(*args, **kwargs):
-        if not request.args.get('token'):
-            disconnect()
-            return False
-        
-        try:
-            # Verify the Firebase token
+        # The identity is verified once on connect and kept for the session
+        identity = socket_sessions.get(request.sid)
+
+        if identity is None:
+            # Session expired or was revoked: re-check the connection's token
             token = request.args.get('token')
-            decoded_token = auth.verify_id_token(token)
-            
-            # Get user info from Firestore
-            user_ref = db.collection('users').where('email', '==', decoded_token['email']).limit(1).get()
-            
-            if not len(user_ref):
+            if not token:
+                print("Token is missing, disconnecting socket")
                 disconnect()
                 return False
-            
-            # Add user info to the request context
-            request.user = {
-                'email': decoded_token['email'],
-                'uid': decoded_token['uid'],
-                'role': user_ref[0].to_dict().get('role', 'user')
-            }
-            
-            return f(*args, **kwargs)
-        except:
-            disconnect()
-            return False
-    return wrapped
 
-def authenticated_only_socketio(f):
-    @wraps(f)
-    def wrapped(*args, **kwargs):
-        # Get the token from the connection's query params using the Flask request
-        token = request.args.get('token')
-        if not token:
-            print("Token is missing, disconnecting socket")
-            disconnect()
-            return False
+            try:
+                identity = socket_sessions.open(request.sid, token)
+            except Exception as e:
+                print(f"Error verifying token: {str(e)}")
+                disconnect()
+                return False
 
-        try:
-            # Verify the Firebase token
-            decoded_token = auth.verify_id_token(token)
-            
-            # Get user info from Firestore
-            user_ref = db.collection('users').where('email', '==', decoded_token['email']).limit(1).get()
-            
-            if not len(user_ref):
+            if identity is None:
                 print("User not found in Firestore, disconnecting socket")
                 disconnect()
                 return False
 
-            # Attach user info to the socket session (use socketio.session for session storage)
-            # This will be available throughout the socket connection
-            request.user = {
-                'email': decoded_token['email'],
-                'uid': decoded_token['uid'],
-                'role': user_ref[0].to_dict().get('role', 'user')
-            }
-         
-            # Call the original function
-            return f(*args, **kwargs)
+        request.user = identity
 
-        except Exception as e:
-            print(f"Error verifying token: {str(e)}")
-            disconnect()
-            return False
+        # Call the original function
+        return f(*args, **kwargs)
 
     return wrapped
 
-def load_user_data():
-    global user_data
-    # Ensure the trainer directory exists
-    if not os.path.exists('trainer'):
-        os.makedirs('trainer')  # Create the directory if it doesn't exist
-        
-    if os.path.exists('trainer/user_data.pkl'):
-        with open('trainer/user_data.pkl', 'rb') as f:
-            user_data = pickle.load(f)
-    else:
-        user_data = {}
-
-def save_user_data():
-    # Ensure the trainer directory exists
-    if not os.path.exists('trainer'):
-        os.makedirs('trainer')  # Create the directory if it doesn't exist
-        
-    with open('trainer/user_data.pkl', 'wb') as f:
-        pickle.dump(user_data, f)
-
+def get_tracker(sid, kind):
+    """Return the face tracker of a client stream, or None if tracking is disabled."""
+    if not config.FACE_TRACKING:
+        return None
+    key = (sid, kind)
+    if key not in face_trackers:
+        face_trackers[key] = FaceTracker(
+            rescan_interval=config.TRACKER_RESCAN_INTERVAL,
+            roi_margin=config.TRACKER_ROI_MARGIN,
+            scale_range=config.TRACKER_SCALE_RANGE
+        )
+    return face_trackers[key]
 
-def process_frame(image_data, face_id):
-    """Process a single frame for face detection and save it."""
+def process_frame(image_data, tracker=None):
+    """Detect the face of an enrollment frame and return its normalized crop and quality measures."""
     try:
-        # Decode the base64 image
-        encoded_data = image_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            raise ValueError("Invalid image data")
+        # Decode the frame (binary attachment or legacy base64 data URL)
+        frame = Frame(image_data, mode=config.FRAME_DECODE_MODE, scale=config.ENROLL_DETECTION_SCALE)
 
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # Detect faces with improved parameters
-        faces = face_detector.detectMultiScale(
-            gray,
+        # Detect faces with improved parameters, on the reduced-resolution image
+        faces = frame.detect_faces(
+            get_face_detector(),
             scaleFactor=1.1,
             minNeighbors=5,
-            minSize=(120, 120),  # Increased minimum face size for better quality
+            min_size=(120, 120),  # Increased minimum face size for better quality
+            tracker=tracker,
             flags=cv2.CASCADE_SCALE_IMAGE
         )
 
         if len(faces) != 1:
-            return None, None, "Please ensure exactly one face is visible in the frame"
+            frame.record_stats()
+            return None, None, None, "Please ensure exactly one face is visible in the frame"
 
-        face_data = []
-        user_folder = f"dataset/{face_id}"
-        os.makedirs(user_folder, exist_ok=True)
+        # Full-resolution grayscale for the face crop
+        gray = frame.gray()
+        frame.record_stats()
 
         x, y, w, h = faces[0]
-        # Add padding to the face region
-        padding = 20
-        x = max(0, x - padding)
-        y = max(0, y - padding)
-        w = min(w + 2 * padding, img.shape[1] - x)
-        h = min(h + 2 * padding, img.shape[0] - y)
-
-        face_data.append({
+        face_data = [{
             "x": int(x),
             "y": int(y),
             "width": int(w),
             "height": int(h)
-        })
+        }]
 
-        # Apply histogram equalization for better contrast
-        face_roi = gray[y:y+h, x:x+w]
-        face_roi = cv2.equalizeHist(face_roi)
+        # Blur and brightness are measured at the training size, before equalization
+        face_roi = cv2.resize(gray[y:y+h, x:x+w], FACE_SIZE)
+        quality = frame_quality.measure(face_roi)
 
-        # Save the processed face image
-        existing_images = len(os.listdir(user_folder))
-        filename = f"{user_folder}/{face_id}.{existing_images + 1}.jpg"
-        cv2.imwrite(filename, face_roi)
+        # Crop, resize and equalize exactly as recognition does, so training
+        # needs neither a disk round trip nor a second detection
+        face_roi = normalize_face(face_roi)
 
-        return face_data, filename, None
+        return face_data, face_roi, quality, None
 
     except Exception as e:
         app.logger.error(f"Error processing frame: {str(e)}")
-        return None, None, str(e)
+        return None, None, None, str(e)
     
 def train_model_incrementally(new_face_id):
     """Train the face recognition model with improved error handling and validation."""
-    global user_data
-    
     try:
-        new_face_samples = []
-        new_face_labels = []
-        label_id = len(user_data)
-        
-        user_folder = f"dataset/{new_face_id}"
-        if not os.path.exists(user_folder):
-            raise ValueError(f"No training data found for user {new_face_id}")
-
-        # Process all images for the new face
-        for image_file in os.listdir(user_folder):
-            if not image_file.endswith(('.jpg', '.jpeg', '.png')):
-                continue
-                
-            image_path = os.path.join(user_folder, image_file)
-            face_array = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-            
-            if face_array is None:
-                continue
-                
-            faces = face_detector.detectMultiScale(
-                face_array,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(120, 120)
-            )
-            
-            for (x, y, w, h) in faces:
-                face_roi = face_array[y:y+h, x:x+w]
-                # Resize to ensure consistent size
-                face_roi = cv2.resize(face_roi, (200, 200))
-                new_face_samples.append(face_roi)
-                new_face_labels.append(label_id)
-
-        if not new_face_samples:
-            raise ValueError("No valid face samples found in the training data")
-
-        # Update user data and save
-        user_data[str(label_id)] = new_face_id
-        save_user_data()
-
-        # Train or update the model
-        if len(user_data) == 1:
-            recognizer.train(new_face_samples, np.array(new_face_labels))
-        else:
-            recognizer.update(new_face_samples, np.array(new_face_labels))
-
-        # Save the updated model
-        recognizer.save('trainer/trainer.yml')
-        
-        return len(user_data)
+        # Add the user's histograms to the model and save it
+        return face_model.enroll(new_face_id, face_dataset.load_samples(new_face_id, get_face_detector()))
 
     except Exception as e:
         app.logger.error(f"Error training model: {str(e)}")
         raise
 
-@socketio.on('connect')
-@authenticated_only_socketio
-def handle_connect(data):
+def train_jobs(jobs, progress):
+    """Train a batch of queued jobs as one model update. Returns {face_id: result or exception}."""
+    results, samples = {}, {}
+    for job in jobs:
+        progress(job, 'loading_samples', 10)
+        try:
+            # Crops buffered during the capture, or the stored dataset
+            if job['samples'] is not None:
+                samples[job['face_id']] = job['samples']
+            else:
+                samples[job['face_id']] = face_dataset.load_samples(job['face_id'], get_face_detector())
+        except Exception as e:
+            app.logger.error(f"Error loading training data for {job['face_id']}: {str(e)}")
+            results[job['face_id']] = e
+        else:
+            progress(job, 'computing_histograms', 40)
+
+    if not samples:
+        return results
+
+    # Every user in the batch lands in the same segment and model version
+    start = time.perf_counter()
+    trained_faces = face_model.enroll_many(samples)
+    train_ms = round(1000 * (time.perf_counter() - start), 1)
+
+    for job in jobs:
+        face_id = job['face_id']
+        if face_id not in samples:
+            continue
+        progress(job, 'saving', 90)
+        try:
+            # Persist the buffered capture in one write, now that the model is updated
+            write_ms = None
+            if job['samples'] is not None:
+                write_ms = round(1000 * face_dataset.save_samples(face_id, job['samples'], captured_by=job['requested_by']), 1)
+        except Exception as e:
+            app.logger.error(f"Error saving the dataset of {face_id}: {str(e)}")
+            results[face_id] = e
+            continue
+
+        # Log successful training through the audit writer
+        audit_writer.add('trained_faces', {
+            'face_id': face_id,
+            'trained_by': job['requested_by'],
+            'trained_at': firestore.SERVER_TIMESTAMP,
+            'frame_count': len(samples[face_id]),
+            'status': 'success'
+        })
+        # Flag the user with an update, never a merge-set: a user deleted
+        # while the job ran must not come back as a stub document
+        with user_directory.writing(face_id):
+            if not storage.users.update_many([face_id], {'isFaceTrained': True}):
+                app.logger.warning(f"User {face_id} no longer exists, not flagging it as trained")
+
+        app.logger.info(f"Trained {face_id}: {len(samples[face_id])} samples, train {train_ms} ms, dataset write {write_ms} ms")
+        results[face_id] = {
+            'jobId': job['id'],
+            'status': f"Training completed successfully. {trained_faces} faces trained.",
+            'trained_faces': trained_faces,
+            'modelVersion': face_model.current().version,
+            'timings': {'train_ms': train_ms, 'dataset_write_ms': write_ms}
+        }
+    return results
+
+def notify_training(job, event, payload):
+    socketio.emit(event, payload, to=training_room(job['id']))
+
+def training_room(job_id):
+    return f"training-{job_id}"
 
-    if not request.args.get('token'):
-        disconnect()
+training_jobs.start(train_jobs, notify_training)
+audit_writer.start(storage)
+user_directory.start(storage.users)
+access_expiry.start(storage.users)
+
+@socketio.on('connect')
+def handle_connect(data=None):
+    token = request.args.get('token')
+    if not token:
         return False
-    
+
     try:
-        token = request.args.get('token')
-        decoded_token = auth.verify_id_token(token)
+        # Verify once per connection; events reuse the stored identity
+        if socket_sessions.open(request.sid, token) is None:
+            return False
+        connected_sids.add(request.sid)
         return True
-    except:
-        disconnect()
+    except Exception as e:
+        app.logger.error(f"Error verifying socket token: {str(e)}")
         return False
 
+@socketio.on('disconnect')
+def handle_disconnect():
+    # Forgotten before the cleanup, so a frame job still running sees it and cleans up after itself
+    connected_sids.discard(request.sid)
+    release_session(request.sid)
+
+def release_session(sid):
+    socket_sessions.close(sid)
+    frame_pool.close_session(sid)
+    capture_buffers.discard(sid)
+    authorization_attempts.close(sid)
+    for kind in ('upload_image', 'recognize_face'):
+        face_trackers.pop((sid, kind), None)
+
+def connected_session_job(f):
+    """Frame jobs: skip those of clients that have disconnected, and release
+    the per-session state a job re-created if its client left while it ran."""
+    @wraps(f)
+    def wrapped(sid, *args, **kwargs):
+        if sid not in connected_sids:
+            return
+        try:
+            return f(sid, *args, **kwargs)
+        finally:
+            if sid not in connected_sids:
+                release_session(sid)
+
+    return wrapped
+
 @socketio.on('upload_image')
 @authenticated_only_socketio
 def handle_upload(data):
+    """Queue an enrollment frame for the worker pool."""
+    frame_pool.submit(request.sid, 'upload_image', process_upload, request.sid, request.user, data)
+
+@connected_session_job
+def process_upload(sid, user, data):
     """Handle image upload with improved validation and error handling."""
     try:
         image_data = data['image']
-        face_id = data['face_id']
+        # Users enroll their own face: the dataset folder is named by the
+        # session's user id, never by a client-supplied face_id
+        face_id = user['id']
 
-        if not image_data or not face_id:
-            emit('frame_error', {'message': 'Invalid request data'})
+        if not image_data:
+            socketio.emit('frame_error', {'message': 'Invalid request data'}, to=sid)
             return
 
-        if face_id not in user_frame_count:
-            user_frame_count[face_id] = 0
-
-        face_data, filename, error = process_frame(image_data, face_id)
+        face_data, face_roi, quality, error = process_frame(image_data, get_tracker(sid, 'upload_image'))
         
         if error:
-            emit('frame_error', {'message': error})
+            socketio.emit('frame_error', {'message': error}, to=sid)
             return
 
-        if not face_data or not filename:
-            emit('frame_error', {'message': 'Failed to process frame'})
+        if not face_data or face_roi is None:
+            socketio.emit('frame_error', {'message': 'Failed to process frame'}, to=sid)
             return
 
-        user_frame_count[face_id] += 1
+        # Keep the crop in memory unless the gate rejects it; nothing touches the disk per frame
+        captured, rejected, complete = capture_buffers.add(sid, face_id, face_roi, quality)
+        if rejected:
+            socketio.emit('frame_error', {'message': REJECTION_MESSAGES[rejected], 'reason': rejected}, to=sid)
+            return
         
-        # Calculate quality metrics
-        frames_needed = 100  # Reduced from 120 for better efficiency
-        current_progress = (user_frame_count[face_id] / frames_needed) * 100
-
-        emit('frame_captured', {
+        # Progress towards the frame count, or the diversity target if that is closer
+        frames_needed = config.ENROLL_FRAMES
+        current_progress = (captured / frames_needed) * 100
+        if capture_buffers.gate is not None:
+            gate = capture_buffers.gate
+            diversity_progress = min(
+                captured / gate.min_frames,
+                capture_buffers.diversity(sid) / gate.diversity_target
+            ) * 100
+            current_progress = 100 if complete else max(current_progress, diversity_progress)
+
+        socketio.emit('frame_captured', {
             'faces': face_data,
-            'status': f"Captured frame {user_frame_count[face_id]}/{frames_needed}",
+            'status': f"Captured frame {captured}/{frames_needed}",
             'progress': current_progress
-        })
-
-        if user_frame_count[face_id] >= frames_needed:
-            emit('capture_completed', {'status': "Capture completed. Starting training..."})
-            
-            try:
-                trained_faces = train_model_incrementally(face_id)
-                
-                # Log successful training
-                db.collection('trained_faces').add({
-                    'face_id': face_id,
-                    'trained_by': request.user['email'],
-                    'trained_at': firestore.SERVER_TIMESTAMP,
-                    'frame_count': frames_needed,
-                    'status': 'success'
-                })
-
-                emit('training_completed', {
-                    'status': f"Training completed successfully. {trained_faces} faces trained.",
-                    'trained_faces': trained_faces
-                })
-                
-                # Update the user's object in the users collection
-                db.collection('users').document(face_id).update({
-                    'isFaceTrained': True
-                })
-                                
-                
-            except Exception as e:
-                emit('training_error', {
-                    'status': "Training failed",
-                    'error': str(e)
-                })
-                
-            finally:
-                user_frame_count[face_id] = 0
+        }, to=sid)
+
+        if complete:
+            # Training runs in the background on the buffered crops; progress goes to the job's
+            # room, which the client joins before the worker can start the job
+            job = training_jobs.submit(
+                face_id, user['email'], samples=capture_buffers.take(sid),
+                on_queued=lambda job: socketio.server.enter_room(sid, training_room(job['id']), namespace='/')
+            )
+            socketio.emit('capture_completed', {
+                'status': "Capture completed. Training queued...",
+                'jobId': job['id']
+            }, to=sid)
 
     except Exception as e:
         app.logger.error(f"Error handling upload: {str(e)}")
-        emit('error', {'message': str(e)})
+        socketio.emit('error', {'message': str(e)}, to=sid)
 
-def verify_face(face_roi, username):
-    """Verify a face with improved confidence calculation."""
+def verify_faces(face_rois, username, model):
+    """Verify the faces of one frame in a single batched match against a model snapshot."""
     try:
-        # Ensure consistent size
-        face_roi = cv2.resize(face_roi, (200, 200))
-        
-        # Apply preprocessing
-        face_roi = cv2.equalizeHist(face_roi)
-        
-        # Get prediction
-        label_id, confidence = recognizer.predict(face_roi)
-        
-        # Convert confidence to percentage (0-100 scale)
-        confidence = round(100 - confidence, 2)
-        
-        # Get recognized name
-        recognized_name = user_data.get(str(label_id), "Unknown")
-        
-        # Calculate name similarity
-        name_similarity = (
-            username.lower() in recognized_name.lower() or
-            recognized_name.lower() in username.lower()
-        )
-        
-        return {
-            'name': recognized_name,
-            'confidence': confidence,
-            'name_match': name_similarity
-        }
-        
-    except Exception as e:
-        app.logger.error(f"Face verification error: {str(e)}")
-        return None
+        probes = []
+        for face_roi in face_rois:
+            # Same size and preprocessing as the enrolled crops
+            probes.append(spatial_histogram(normalize_face(face_roi)))
+
+        if config.RECOGNITION_MODE == 'verify':
+            # 1:1 - compare only against the claimed user's histograms
+            matches = model.verify(probes, username)
+        else:
+            # 1:N - search every enrolled user
+            matches = [top[0] if top else None for top in model.identify(probes)]
 
+        results = []
+        for match in matches:
+            if match is None:
+                results.append({'name': "Unknown", 'confidence': 0, 'name_match': False})
+                continue
+            recognized_name, distance = match
 
-def log_authorization_attempt(user_email, recognized_name, confidence, authorized):
-    try:
-        db.collection('authorization_logs').add({
-            'user_email': user_email,
-            'recognized_as': recognized_name,
-            'confidence': confidence,
-            'authorized': authorized,
-            'timestamp': firestore.SERVER_TIMESTAMP,
-            'ip_address': request.remote_addr
-        })
+            # Convert confidence to percentage (0-100 scale)
+            confidence = round(100 - distance, 2)
+
+            # Calculate name similarity
+            name_similarity = (
+                username.lower() in recognized_name.lower() or
+                recognized_name.lower() in username.lower()
+            )
+
+            results.append({
+                'name': recognized_name,
+                'confidence': confidence,
+                'name_match': name_similarity
+            })
+        return results
+        
     except Exception as e:
-        app.logger.error(f"Error logging authorization attempt: {e}")
+        app.logger.error(f"Face verification error: {str(e)}")
+        return []
+
+
+def log_authorization_attempt(user_email, recognized_name, confidence, authorized, ip_address):
+    # Queued for the background audit writer; never waits on Firestore. Runs on
+    # frame workers too, so the client's address is passed in, never read from `request`
+    audit_writer.add('authorization_logs', {
+        'user_email': user_email,
+        'recognized_as': recognized_name,
+        'confidence': confidence,
+        'authorized': authorized,
+        'timestamp': firestore.SERVER_TIMESTAMP,
+        'ip_address': ip_address
+    })
+    # Keep the dashboard counters current instead of re-aggregating the logs
+    authorization_analytics.record_decision(audit_writer, user_email, authorized, confidence)
 
 @socketio.on('recognize_face')
 @authenticated_only_socketio
 def handle_recognition(data):
+    """Queue a recognition frame for the worker pool, keeping only the newest pending frame."""
+    # The claimed user is the session's, not whatever the client sends
+    username = request.user.get('id') or data.get('username', '')
+
+    attempt_id = data.get('attemptId')
+    if attempt_id and not authorization_attempts.accept_frame(
+        request.sid, attempt_id, username, request.remote_addr
+    ):
+        # The attempt is already decided; don't spend work on its remaining frames
+        return
+
+    frame_pool.submit(
+        request.sid, 'recognize_face', process_recognition, request.sid, request.user, data, username,
+        time.time(), coalesce=True
+    )
+
+@connected_session_job
+def process_recognition(sid, user, data, username, received_at):
     """Handle face recognition with improved error handling and verification."""
     try:
         image_data = data['image']
-        username = data.get('username', '').lower()
+        username = username.lower()
 
         if not image_data or not username:
             raise ValueError("Invalid request data")
 
-        # Decode and process image
-        encoded_data = image_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if img is None:
-            raise ValueError("Invalid image data")
-
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = face_detector.detectMultiScale(
-            gray,
+        # Decode and detect on the reduced-resolution image
+        frame = Frame(image_data, mode=config.FRAME_DECODE_MODE, scale=config.RECOGNITION_DETECTION_SCALE)
+        faces = frame.detect_faces(
+            get_face_detector(),
             scaleFactor=1.1,
             minNeighbors=5,
-            minSize=(120, 120)
+            min_size=(120, 120),
+            tracker=get_tracker(sid, 'recognize_face')
         )
 
-        recognition_results = []
-        
+        # Crops for LBPH come from the full-resolution image
+        gray = frame.gray() if len(faces) else None
+        frame.record_stats()
+
+        boxes, face_rois = [], []
         for (x, y, w, h) in faces:
             face_roi = gray[y:y+h, x:x+w]
             
             if face_roi.size == 0:
                 continue
+            boxes.append((x, y, w, h))
+            face_rois.append(face_roi)
 
-            result = verify_face(face_roi, username)
-            if result:
-                recognition_results.append({
-                    "x": int(x),
-                    "y": int(y),
-                    "width": int(w),
-                    "height": int(h),
-                    **result
-                })
-
-        emit('recognition_result', {
+        # Every face of this frame is matched against the same model version
+        model = face_model.current()
+
+        recognition_results = []
+        for (x, y, w, h), result in zip(boxes, verify_faces(face_rois, username, model)):
+            recognition_results.append({
+                "x": int(x),
+                "y": int(y),
+                "width": int(w),
+                "height": int(h),
+                **result
+            })
+
+        socketio.emit('recognition_result', {
             'faces': recognition_results,
-            'status': 'Processing completed'
-        })
+            'status': 'Processing completed',
+            'modelVersion': model.version,
+            # Echoed so the client can measure frame-to-result latency
+            'frameId': data.get('frameId'),
+            'sentAt': data.get('sentAt'),
+            'serverLatencyMs': round(1000 * (time.time() - received_at), 1)
+        }, to=sid)
+
+        # Feed the attempt's rolling window; the first frame that settles it answers the client
+        if data.get('attemptId'):
+            decision = authorization_attempts.record(sid, data['attemptId'], recognition_results)
+            if decision:
+                emit_authorization_decision(sid, user, decision)
 
     except Exception as e:
         app.logger.error(f"Recognition error: {str(e)}")
-        emit('error', {'message': str(e)})
+        socketio.emit('error', {'message': str(e)}, to=sid)
 
 @socketio.on('get_final_authorization')
 @authenticated_only_socketio
 def get_final_authorization(data):
-    """Make final authorization decision with improved security checks."""
+    """End of the client's capture: decide the attempt from the server's own window if still open."""
     try:
-        recognized_faces = data.get('recognizedFaces', [])
-        username = data.get('username', '').lower()
-        
-        if not recognized_faces or not username:
-            raise ValueError("Invalid request data")
-
-        # Find best match
-        best_match = max(recognized_faces, key=lambda x: x['confidence'])
-        
-        # Enhanced authorization criteria
-        authorized = (
-            len(recognized_faces) == 1 and  # Exactly one face detected
-            best_match['confidence'] >= 30 and  # Higher confidence threshold
-            best_match['name_match'] and  # Name must match
-            best_match['name'] != "Unknown"  # Must be a known user
-        )
-
-        # Log the authorization attempt
-        log_authorization_attempt(
-            user_email=request.user['email'],
-            recognized_name=best_match['name'],
-            confidence=best_match['confidence'],
-            authorized=authorized
-        )
-
-        emit('final_authorization', {
-            'status': 'Authorized' if authorized else 'Unauthorized',
-            'recognizedAs': best_match['name'] if authorized else None,
-            'confidence': best_match['confidence'],
-            'reason': get_authorization_reason(authorized, best_match)
-        })
-        
-        app.logger.info(f"Authorized: {authorized} ")
-        
+        decision = authorization_attempts.finish(request.sid, data.get('attemptId'))
+        if decision is None:
+            raise ValueError("No recognition frames received for this attempt")
+        if decision['decidedBy'] == 'capture_ended':
+            emit_authorization_decision(request.sid, request.user, decision)
 
     except Exception as e:
         app.logger.error(f"Authorization error: {str(e)}")
         emit('final_authorization', {
             'status': 'Unauthorized',
+            'attemptId': data.get('attemptId'),
             'error': str(e)
         })
 
+def emit_authorization_decision(sid, user, decision):
+    """Log an attempt's decision and send it to the client."""
+    authorized, match = decision['authorized'], decision['match']
+
+    # Log the authorization attempt
+    log_authorization_attempt(
+        user_email=user['email'],
+        recognized_name=match['name'] if match else "Unknown",
+        confidence=match['confidence'] if match else 0,
+        authorized=authorized,
+        ip_address=decision['ip_address']
+    )
+
+    socketio.emit('final_authorization', {
+        'status': 'Authorized' if authorized else 'Unauthorized',
+        'recognizedAs': match['name'] if authorized else None,
+        'confidence': match['confidence'] if match else 0,
+        'reason': get_authorization_reason(authorized, match),
+        'attemptId': decision['attemptId'],
+        'decidedBy': decision['decidedBy'],
+        'framesEvaluated': decision['framesEvaluated'],
+        'timeToDecisionMs': decision['timeToDecisionMs']
+    }, to=sid)
+
+    app.logger.info(
+        f"Authorized: {authorized} after {decision['framesEvaluated']} frames, "
+        f"{decision['timeToDecisionMs']} ms ({decision['decidedBy']})"
+    )
+
 def get_authorization_reason(authorized, match):
     """Get detailed reason for authorization decision."""
     if authorized:
         return "Face successfully verified with high confidence"
     
-    if match['confidence'] < 50:
+    if match is None:
+        return "No single face detected"
+    if match['confidence'] < config.AUTH_MIN_CONFIDENCE:
         return "Confidence too low for secure verification"
     if not match['name_match']:
         return "Name mismatch"
     if match['name'] == "Unknown":
         return "Unknown face"
-    return "Multiple verification criteria not met"
+    return "Face not verified in enough frames"
         
 if __name__ == '__main__':
-    load_user_data()
-    if os.path.exists('trainer/trainer.yml'):
-        recognizer.read('./trainer/trainer.yml')
+    face_model.load()
  
     socketio.run(app, debug=True, port=5000,use_reloader=True)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+import config
+from storage import MAX_BATCH_WRITES
+
+logger = logging.getLogger(__name__)
+
+# Marker documents of batches that create no document of their own
+BATCH_MARKERS = 'audit_batches'
+
+
+class AuditWriter:
+    """Background writer for audit records (authorization logs, training events).
+
+    Callers only enqueue a write and return. A worker thread drains the
+    bounded queue into batched storage writes, committed when `batch_size`
+    writes are waiting or `flush_interval` seconds after the first one. A
+    failed commit is retried with backoff up to `max_retries` times, then
+    dropped. When the queue is full new writes are dropped rather than
+    blocking the caller. Pending writes are flushed at interpreter exit.
+
+    New documents get their id when they are queued, and a batch commits
+    atomically, so before retrying the writer checks whether one of the
+    batch's new documents (or a marker added for that purpose) exists: a
+    commit that failed after landing is not applied again, so logs are not
+    duplicated and counter increments are not applied twice.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=1.0, max_retries=3):
+        # One slot is kept for a batch's marker document
+        self.batch_size = min(batch_size, MAX_BATCH_WRITES - 1)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._storage = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0, 'written': 0, 'batches': 0, 'retried': 0, 'recovered': 0,
+            'dropped_queue_full': 0, 'dropped_failed': 0, 'commit_seconds': 0.0,
+        }
+
+    def start(self, storage):
+        self._storage = storage
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def add(self, collection, data):
+        """Queue a new document in `collection`, with an id generated now."""
+        return self._enqueue((collection, uuid.uuid4().hex[:20], data, False), created=True)
+
+    def set(self, collection, doc_id, data, merge=True):
+        """Queue a write of `data` into a document (merged into it by default)."""
+        return self._enqueue((collection, doc_id, data, merge))
+
+    def _enqueue(self, write, created=False):
+        try:
+            self._queue.put_nowait((write, created))
+        except queue.Full:
+            self._count('dropped_queue_full')
+            logger.warning(f"Audit queue full, dropping write to {write[0]}")
+            return False
+        self._count('enqueued')
+        return True
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Collect until the batch is full or the flush interval has passed
+            entries = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(entries) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entries.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(entries)
+
+    def _commit(self, entries):
+        writes = [write for write, _ in entries]
+        # A document only this batch creates shows whether an attempt landed
+        probe = next((write for write, created in entries if created), None)
+        if probe is None:
+            probe = (BATCH_MARKERS, uuid.uuid4().hex[:20], {
+                'writes': len(writes), 'written_at': datetime.now(timezone.utc)
+            }, False)
+            writes.append(probe)
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                if attempt and self._storage.exists(probe[0], probe[1]):
+                    # The previous attempt was committed; only its reply was lost
+                    self._count('recovered')
+                else:
+                    self._storage.write_batch(writes)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Dropping {len(entries)} audit writes after {attempt + 1} attempts: {str(e)}")
+                    self._count('dropped_failed', len(entries))
+                    return
+                self._count('retried')
+                time.sleep(min(0.2 * 2 ** attempt, 5.0))
+                continue
+
+            with self._lock:
+                self._stats['written'] += len(entries)
+                self._stats['batches'] += 1
+                self._stats['commit_seconds'] += time.perf_counter() - start
+            return
+
+    def flush(self):
+        """Commit everything queued so far from the calling thread."""
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(entries) == self.batch_size:
+                self._commit(entries)
+                entries = []
+        if entries:
+            self._commit(entries)
+
+    def close(self):
+        """Stop the worker and flush the remaining writes (runs at exit)."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats['batches']
+        stats['queued'] = self._queue.qsize()
+        stats['avg_batch_size'] = round(stats['written'] / batches, 1) if batches else 0
+        stats['avg_commit_ms'] = round(1000 * stats.pop('commit_seconds') / batches, 1) if batches else 0
+        return stats
+
+
+audit_writer = AuditWriter(
+    max_queue=config.AUDIT_QUEUE_SIZE,
+    batch_size=config.AUDIT_BATCH_SIZE,
+    flush_interval=config.AUDIT_FLUSH_INTERVAL,
+    max_retries=config.AUDIT_MAX_RETRIES
+)
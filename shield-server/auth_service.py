@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+from firebase_admin import auth
+import firebase_service
+from user_directory import user_directory
+import config
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire at a per-entry deadline."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate):
+        """Drop every entry whose value matches `predicate`."""
+        with self._lock:
+            stale = [key for key, (value, _) in self._entries.items() if predicate(value)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+if config.AUTH_TOKENS not in ('firebase', 'unsigned'):
+    raise ValueError(f"Unknown AUTH_TOKENS: {config.AUTH_TOKENS}")
+if config.AUTH_TOKENS == 'unsigned' and config.STORAGE_BACKEND != 'memory':
+    # Anyone could forge an unsigned token, so never against real user records
+    raise ValueError("AUTH_TOKENS=unsigned is only allowed with STORAGE_BACKEND=memory")
+
+# Decoded ID tokens keyed by a hash of the raw token, expiring at the token's `exp`
+_token_cache = TTLCache(config.AUTH_TOKEN_CACHE_SIZE)
+
+
+def _token_key(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def verify_id_token(token, check_revoked=False):
+    """Verify a Firebase ID token, reusing the decoded claims until the token expires."""
+    key = _token_key(token)
+    cached = _token_cache.get(key)
+    if cached is not None and (cached['revocation_checked'] or not check_revoked):
+        return cached['claims']
+
+    if config.AUTH_TOKENS == 'unsigned':
+        decoded_token = _decode_unsigned(token)
+    else:
+        decoded_token = auth.verify_id_token(token, check_revoked=check_revoked, app=firebase_service.app())
+    _token_cache.set(
+        key,
+        {'claims': decoded_token, 'revocation_checked': check_revoked},
+        expires_at=decoded_token.get('exp', 0)
+    )
+    return decoded_token
+
+
+def _decode_unsigned(token):
+    """Claims of an unsigned load-test token: a JWT whose payload is trusted as-is, apart from `exp`."""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except Exception as e:
+        raise auth.InvalidIdTokenError(f"Malformed token: {str(e)}")
+    if claims.get('exp', 0) <= time.time():
+        raise auth.InvalidIdTokenError("Token expired")
+    claims.setdefault('uid', claims.get('sub'))
+    return claims
+
+
+def set_role_claim(uid, role):
+    """Store a user's role as a custom claim of their Firebase account, for their next token."""
+    if config.AUTH_TOKENS == 'unsigned':
+        # Unsigned tokens carry whatever role they were minted with
+        return
+    auth.set_custom_user_claims(uid, {'role': role}, app=firebase_service.app())
+
+
+def delete_account(uid):
+    """Delete a user's Firebase account; False if there is none."""
+    if config.AUTH_TOKENS == 'unsigned':
+        return False
+    try:
+        auth.delete_user(uid, app=firebase_service.app())
+    except auth.UserNotFoundError:
+        return False
+    return True
+
+
+def lookup_user(email):
+    """Return the user's id, uid and role from the user directory, or None if the email isn't registered."""
+    user_data = user_directory.by_email(email)
+    if user_data is None:
+        return None
+    return {
+        'id': user_data['id'],
+        'uid': user_data.get('uid', user_data['id']),
+        'email': email,
+        'role': user_data.get('role', 'user'),
+    }
+
+
+def invalidate_user(email=None, uid=None):
+    """Forget cached tokens of a user whose record changed."""
+    _token_cache.discard_where(
+        lambda entry: (email and entry['claims'].get('email') == email) or
+                      (uid and entry['claims'].get('uid') == uid)
+    )
+
+
+def cache_stats():
+    return {'tokens': _token_cache.stats()}
+
+
+def verify_token(f):
+    """Require a valid `Authorization: Bearer <token>` header and expose the claims as `request.user`."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return jsonify({'message': 'No token provided'}), 401
+
+        token = auth_header.split('Bearer ')[1]
+        try:
+            request.user = verify_id_token(token)
+        except Exception as e:
+            return jsonify({'message': 'Invalid token'}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
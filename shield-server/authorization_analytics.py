@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+
+# Counter documents, updated with increments as decisions are logged:
+#   authorization_stats/totals            all attempts
+#   authorization_stats_hourly/<hour>     one per UTC hour, id 'YYYY-MM-DDTHH'
+#   authorization_stats_users/<email>     one per user
+TOTALS_COLLECTION = 'authorization_stats'
+TOTALS_DOC = 'totals'
+HOURLY_COLLECTION = 'authorization_stats_hourly'
+USERS_COLLECTION = 'authorization_stats_users'
+
+# Confidence histogram buckets of 10 points: c00 (0-9.99) ... c90 (90-100)
+BUCKET_WIDTH = 10
+
+
+def hour_id(when):
+    return when.astimezone(timezone.utc).strftime('%Y-%m-%dT%H')
+
+
+def user_doc_id(user_email):
+    # Document ids cannot contain '/'
+    return user_email.replace('/', '%2F')
+
+
+def confidence_bucket(confidence):
+    bucket = int(min(max(confidence, 0), 99.99) // BUCKET_WIDTH) * BUCKET_WIDTH
+    return f"c{bucket:02d}"
+
+
+def counter_updates(user_email, authorized, confidence, when, amount=1):
+    """(collection, doc_id, fields) merges that count one decision, or `amount` of them."""
+    increment = firestore.Increment(amount)
+    counts = {
+        'attempts': increment,
+        'authorized' if authorized else 'denied': increment,
+        'confidence_histogram': {confidence_bucket(confidence): increment},
+    }
+    return [
+        (TOTALS_COLLECTION, TOTALS_DOC, counts),
+        (HOURLY_COLLECTION, hour_id(when), {**counts, 'hour': hour_id(when)}),
+        (USERS_COLLECTION, user_doc_id(user_email), {**counts, 'user_email': user_email, 'last_attempt_at': when}),
+    ]
+
+
+def backfill_updates(decisions):
+    """Counter increments covering already-logged decisions, merged per document.
+
+    `decisions` yields (user_email, authorized, confidence, timestamp). Each
+    counter document gets a single write whatever the number of logs.
+    """
+    documents = {}
+    for user_email, authorized, confidence, when in decisions:
+        for collection, doc_id, labels in (
+            (TOTALS_COLLECTION, TOTALS_DOC, {}),
+            (HOURLY_COLLECTION, hour_id(when), {'hour': hour_id(when)}),
+            # last_attempt_at is left to live decisions, which are always newer
+            (USERS_COLLECTION, user_doc_id(user_email), {'user_email': user_email}),
+        ):
+            counts = documents.setdefault((collection, doc_id), {'attempts': 0, 'authorized': 0, 'denied': 0, 'confidence_histogram': {}, **labels})
+            counts['attempts'] += 1
+            counts['authorized' if authorized else 'denied'] += 1
+            bucket = confidence_bucket(confidence)
+            counts['confidence_histogram'][bucket] = counts['confidence_histogram'].get(bucket, 0) + 1
+
+    def increments(counts):
+        return {
+            field: increments(value) if isinstance(value, dict) else
+            firestore.Increment(value) if isinstance(value, int) else value
+            for field, value in counts.items() if value != 0
+        }
+
+    return [(collection, doc_id, increments(counts)) for (collection, doc_id), counts in documents.items()]
+
+
+def record_decision(writer, user_email, authorized, confidence, when=None):
+    """Queue the counter increments of one logged decision on the audit writer."""
+    when = when or datetime.now(timezone.utc)
+    for collection, doc_id, fields in counter_updates(user_email, authorized, confidence, when):
+        writer.set(collection, doc_id, fields)
+
+
+def read_summary(logs, since, until, email=None, user_limit=100):
+    """Totals, the hourly buckets from since to until and per-user counters, from a handful of documents."""
+    if email:
+        user = logs.counter(USERS_COLLECTION, user_doc_id(email))
+        users = [user] if user else []
+    else:
+        users = logs.top_counters(USERS_COLLECTION, 'attempts', user_limit)
+
+    return {
+        'totals': logs.counter(TOTALS_COLLECTION, TOTALS_DOC) or {},
+        # Hourly documents are named by hour, so the range is a document id range
+        'hourly': logs.counter_range(HOURLY_COLLECTION, hour_id(since), hour_id(until + timedelta(hours=1))),
+        'users': [_serialize(counts) for counts in users],
+    }
+
+
+def _serialize(counts):
+    if isinstance(counts.get('last_attempt_at'), datetime):
+        counts['last_attempt_at'] = counts['last_attempt_at'].isoformat()
+    return counts
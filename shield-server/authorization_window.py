@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import deque
+from metrics import percentiles
+
+
+class AuthorizationAttempts:
+    """Server-side authorization decisions from a rolling window of recognition results.
+
+    Each session has at most one attempt, identified by the `attemptId` its
+    frames carry. Every recognized frame is scored on the server (exactly one
+    face, matching the session's user, at least `min_confidence`), and the
+    attempt is authorized as soon as `required` of the last `window` frames
+    pass. Otherwise it is denied once `timeout` seconds have passed since its
+    first frame, or when the client reports the end of its capture. Frames of
+    a decided attempt are dropped before any processing.
+    """
+
+    def __init__(self, window=5, required=3, min_confidence=30, timeout=5.0):
+        self.window = window
+        self.required = required
+        self.min_confidence = min_confidence
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self._decision_seconds = deque(maxlen=1000)
+        self._stats = {'attempts': 0, 'authorized': 0, 'denied': 0, 'early_exits': 0, 'dropped_frames': 0}
+
+    def accept_frame(self, sid, attempt_id, face_id, ip_address):
+        """Return True if a frame of this attempt should be processed, starting the attempt if new."""
+        with self._lock:
+            attempt = self._attempts.get(sid)
+            if attempt is None or attempt['id'] != attempt_id:
+                attempt = {
+                    'id': attempt_id,
+                    'face_id': face_id,
+                    'ip_address': ip_address,
+                    'started_at': time.time(),
+                    'outcomes': deque(maxlen=self.window),
+                    'frames': 0,
+                    'best': None,
+                    'decision': None,
+                }
+                self._attempts[sid] = attempt
+                self._stats['attempts'] += 1
+            if attempt['decision'] is not None:
+                self._stats['dropped_frames'] += 1
+                return False
+            return True
+
+    def record(self, sid, attempt_id, faces):
+        """Score one frame's recognition results; return the decision if this frame settles the attempt."""
+        with self._lock:
+            attempt = self._attempts.get(sid)
+            if attempt is None or attempt['id'] != attempt_id or attempt['decision'] is not None:
+                return None
+
+            attempt['frames'] += 1
+            match = faces[0] if len(faces) == 1 else None
+            passed = bool(
+                match and match['name_match'] and match['name'] != "Unknown"
+                and match['confidence'] >= self.min_confidence
+            )
+            attempt['outcomes'].append(passed)
+            if match and (attempt['best'] is None or match['confidence'] > attempt['best']['confidence']):
+                attempt['best'] = match
+
+            if sum(attempt['outcomes']) >= self.required:
+                return self._decide(attempt, True, 'window')
+            if time.time() - attempt['started_at'] >= self.timeout:
+                return self._decide(attempt, False, 'timeout')
+            return None
+
+    def finish(self, sid, attempt_id=None):
+        """Decide an attempt that is still open because its capture ended (denied: the rule was never met)."""
+        with self._lock:
+            attempt = self._attempts.get(sid)
+            if attempt is None or (attempt_id is not None and attempt['id'] != attempt_id):
+                return None
+            if attempt['decision'] is not None:
+                return attempt['decision']
+            return self._decide(attempt, False, 'capture_ended')
+
+    def close(self, sid):
+        with self._lock:
+            self._attempts.pop(sid, None)
+
+    def _decide(self, attempt, authorized, decided_by):
+        elapsed = time.time() - attempt['started_at']
+        attempt['decision'] = {
+            'attemptId': attempt['id'],
+            'authorized': authorized,
+            'match': attempt['best'],
+            'decidedBy': decided_by,
+            'framesEvaluated': attempt['frames'],
+            'passedFrames': sum(attempt['outcomes']),
+            'timeToDecisionMs': round(1000 * elapsed, 1),
+            'face_id': attempt['face_id'],
+            'ip_address': attempt['ip_address'],
+        }
+        self._stats['authorized' if authorized else 'denied'] += 1
+        if decided_by == 'window':
+            self._stats['early_exits'] += 1
+        self._decision_seconds.append(elapsed)
+        return attempt['decision']
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = sum(1 for attempt in self._attempts.values() if attempt['decision'] is None)
+            stats['time_to_decision_ms'] = percentiles(list(self._decision_seconds))
+        return stats
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+from metrics import percentiles
+
+
+class CaptureBuffers:
+    """Normalized enrollment crops of each capture session, kept in memory.
+
+    Accepted frames used to be written as one JPEG each (after listing the
+    user's folder to pick a filename) and read back, decoded and re-detected at
+    training time. Crops now stay in a bounded per-session buffer: training
+    reads them from here and the dataset is written in one bulk write
+    afterwards, off the frame path.
+
+    With a `QualityGate`, blurry, badly lit and near-duplicate frames are
+    rejected before they are buffered, and a capture completes as soon as it
+    is diverse enough rather than after `capacity` frames.
+    """
+
+    def __init__(self, capacity=100, gate=None):
+        self.capacity = capacity
+        self.gate = gate
+        self._lock = threading.Lock()
+        # sid -> capture state (face_id, crops, dHashes of accepted and of distinct frames)
+        self._buffers = {}
+        self._append_seconds = deque(maxlen=1000)
+        self._stats = {'frames': 0, 'captures': 0, 'discarded': 0, 'early_stops': 0, 'frames_saved': 0}
+        self._rejected = {}
+
+    def add(self, sid, face_id, crop, quality=None):
+        """Buffer one normalized crop if the gate accepts it.
+
+        Returns (frames buffered, rejection reason or None, capture complete).
+        """
+        start = time.perf_counter()
+        with self._lock:
+            capture = self._buffers.get(sid)
+            if capture is None or capture['face_id'] != face_id:
+                # A new capture (or a capture for another user) starts over
+                capture = {'face_id': face_id, 'crops': deque(maxlen=self.capacity), 'hashes': [], 'distinct': []}
+                self._buffers[sid] = capture
+
+            if self.gate is not None and quality is not None:
+                reason = self.gate.check(quality, capture['hashes'])
+                if reason is not None:
+                    self._rejected[reason] = self._rejected.get(reason, 0) + 1
+                    return len(capture['crops']), reason, False
+                if self.gate.is_distinct(quality, capture['distinct']):
+                    capture['distinct'].append(quality['dhash'])
+                capture['hashes'].append(quality['dhash'])
+
+            capture['crops'].append(crop)
+            count = len(capture['crops'])
+            complete = count >= self.capacity
+            if not complete and self.gate is not None and self.gate.is_complete(count, len(capture['distinct'])):
+                complete = True
+                self._stats['early_stops'] += 1
+                self._stats['frames_saved'] += self.capacity - count
+            self._stats['frames'] += 1
+            self._append_seconds.append(time.perf_counter() - start)
+        return count, None, complete
+
+    def diversity(self, sid):
+        """Distinct frames of the session's capture so far."""
+        with self._lock:
+            capture = self._buffers.get(sid)
+            return len(capture['distinct']) if capture else 0
+
+    def take(self, sid):
+        """Remove and return the session's crops as one (N, 200, 200) array."""
+        with self._lock:
+            capture = self._buffers.pop(sid, None)
+            if not capture or not capture['crops']:
+                return None
+            self._stats['captures'] += 1
+        return np.stack(capture['crops'])
+
+    def discard(self, sid):
+        with self._lock:
+            if self._buffers.pop(sid, None) is not None:
+                self._stats['discarded'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._buffers)
+            stats['rejected'] = dict(self._rejected)
+            stats['buffered_bytes'] = sum(
+                sum(crop.nbytes for crop in capture['crops']) for capture in self._buffers.values()
+            )
+            stats['append_ms'] = percentiles(list(self._append_seconds))
+        return stats
@@ -0,0 +1,96 @@
+import os
+
+# Server tunables. Every value can be overridden with an environment variable of the same name.
+
+# Auth caches
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 1024))
+# 'firebase' verifies ID tokens with Firebase Authentication. 'unsigned'
+# accepts any unexpired JWT payload without checking its signature, so the
+# server can be load-tested offline; it is refused unless STORAGE_BACKEND is
+# 'memory'.
+AUTH_TOKENS = os.environ.get('AUTH_TOKENS', 'firebase')
+
+# Storage backend for users, authorization logs and trained-faces records:
+# 'firestore', or 'memory' for offline benchmarks. The memory backend waits
+# STORAGE_LATENCY_MS plus up to STORAGE_LATENCY_JITTER_MS per call to
+# simulate Firestore round trips.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'firestore')
+STORAGE_LATENCY_MS = float(os.environ.get('STORAGE_LATENCY_MS', 0))
+STORAGE_LATENCY_JITTER_MS = float(os.environ.get('STORAGE_LATENCY_JITTER_MS', 0))
+
+# The users collection is mirrored in memory by a snapshot listener. Reads
+# fall back to Firestore while a write made by this server has not reached
+# the mirror, and all of them do (and the listener is restarted) once one
+# has been missing for more than USER_DIRECTORY_MAX_LAG seconds.
+USER_DIRECTORY_MAX_LAG = float(os.environ.get('USER_DIRECTORY_MAX_LAG', 5.0))
+
+# Seconds a successful face authorization opens the secure route for
+SECURE_ACCESS_SECONDS = float(os.environ.get('SECURE_ACCESS_SECONDS', 30))
+
+# Frame decoding for face detection. 'color' decodes BGR and converts to gray;
+# 'gray' decodes straight to grayscale and allows a reduced-resolution decode
+# (scale 1, 2, 4 or 8) for the detection pass.
+FRAME_DECODE_MODE = os.environ.get('FRAME_DECODE_MODE', 'gray')
+ENROLL_DETECTION_SCALE = int(os.environ.get('ENROLL_DETECTION_SCALE', 2))
+RECOGNITION_DETECTION_SCALE = int(os.environ.get('RECOGNITION_DETECTION_SCALE', 2))
+
+# Worker pool for the frame pipeline (decode, detection, recognition, training).
+# Each client stream gets a queue of FRAME_QUEUE_DEPTH frames; when it is full
+# FRAME_QUEUE_POLICY drops either the oldest queued frame or the incoming one.
+FRAME_WORKERS = int(os.environ.get('FRAME_WORKERS', os.cpu_count() or 4))
+FRAME_QUEUE_DEPTH = int(os.environ.get('FRAME_QUEUE_DEPTH', 4))
+FRAME_QUEUE_POLICY = os.environ.get('FRAME_QUEUE_POLICY', 'drop_oldest')
+
+# Face tracking between frames of a stream: search near the last face and
+# fall back to a full-frame scan when it is lost or every N frames.
+FACE_TRACKING = os.environ.get('FACE_TRACKING', 'true').lower() == 'true'
+TRACKER_RESCAN_INTERVAL = int(os.environ.get('TRACKER_RESCAN_INTERVAL', 10))
+TRACKER_ROI_MARGIN = float(os.environ.get('TRACKER_ROI_MARGIN', 0.5))
+TRACKER_SCALE_RANGE = float(os.environ.get('TRACKER_SCALE_RANGE', 0.3))
+
+# 'verify' matches a probe only against the claimed user's histograms (1:1);
+# 'identify' searches every enrolled user (1:N).
+RECOGNITION_MODE = os.environ.get('RECOGNITION_MODE', 'verify')
+
+# Frames captured per enrollment; their normalized crops are buffered in
+# memory until training takes them.
+ENROLL_FRAMES = int(os.environ.get('ENROLL_FRAMES', 100))
+
+# Enrollment frame gate: blurry (Laplacian variance), badly lit and
+# near-duplicate (dHash distance in bits) frames are rejected, and a capture
+# ends early once ENROLL_DIVERSITY_TARGET frames at least
+# ENROLL_DIVERSE_DISTANCE bits apart were accepted (after ENROLL_MIN_FRAMES).
+ENROLL_QUALITY_GATE = os.environ.get('ENROLL_QUALITY_GATE', 'true').lower() == 'true'
+ENROLL_MIN_SHARPNESS = float(os.environ.get('ENROLL_MIN_SHARPNESS', 50))
+ENROLL_MIN_BRIGHTNESS = float(os.environ.get('ENROLL_MIN_BRIGHTNESS', 40))
+ENROLL_MAX_BRIGHTNESS = float(os.environ.get('ENROLL_MAX_BRIGHTNESS', 215))
+ENROLL_DUPLICATE_DISTANCE = int(os.environ.get('ENROLL_DUPLICATE_DISTANCE', 3))
+ENROLL_DIVERSE_DISTANCE = int(os.environ.get('ENROLL_DIVERSE_DISTANCE', 10))
+ENROLL_DIVERSITY_TARGET = int(os.environ.get('ENROLL_DIVERSITY_TARGET', 25))
+ENROLL_MIN_FRAMES = int(os.environ.get('ENROLL_MIN_FRAMES', 40))
+
+# Authorization is decided on the server from the recognition results of an
+# attempt: authorized as soon as AUTH_REQUIRED_FRAMES of the last
+# AUTH_WINDOW_FRAMES frames show exactly one face of the user with at least
+# AUTH_MIN_CONFIDENCE, denied after AUTH_ATTEMPT_TIMEOUT seconds otherwise.
+AUTH_WINDOW_FRAMES = int(os.environ.get('AUTH_WINDOW_FRAMES', 5))
+AUTH_REQUIRED_FRAMES = int(os.environ.get('AUTH_REQUIRED_FRAMES', 3))
+AUTH_MIN_CONFIDENCE = float(os.environ.get('AUTH_MIN_CONFIDENCE', 30))
+AUTH_ATTEMPT_TIMEOUT = float(os.environ.get('AUTH_ATTEMPT_TIMEOUT', 5.0))
+
+# Enrollment training jobs waiting together are trained as one model update,
+# up to this many users per update.
+TRAINING_MAX_BATCH = int(os.environ.get('TRAINING_MAX_BATCH', 16))
+
+# Packed dataset archives (dataset/<face_id>.npz) are written uncompressed by
+# default: zlib makes writes ~50x and full-dataset reads ~5x slower for ~15%
+# less disk on 200x200 crops.
+DATASET_COMPRESS = os.environ.get('DATASET_COMPRESS', 'false').lower() == 'true'
+
+# Audit records (authorization logs, training events) are written by a
+# background thread as Firestore batched writes: up to AUDIT_BATCH_SIZE
+# writes, or whatever is queued AUDIT_FLUSH_INTERVAL seconds after the first.
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))
+AUDIT_MAX_RETRIES = int(os.environ.get('AUDIT_MAX_RETRIES', 3))
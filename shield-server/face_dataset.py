@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import cv2
+import numpy as np
+import config
+from frame_pipeline import FACE_SIZE
+
+logger = logging.getLogger(__name__)
+
+DATASET_DIR = 'dataset'
+# Version of the archive layout, stored in each archive's metadata
+ARCHIVE_FORMAT = 1
+
+
+# Face ids are user document ids; anything else could name a path outside the dataset
+FACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def dataset_path(face_id, suffix=''):
+    """Path of a user's dataset entry, after checking that it stays inside DATASET_DIR.
+
+    Every path that is written, renamed or removed goes through here; an
+    invalid face id raises ValueError.
+    """
+    if not isinstance(face_id, str) or not FACE_ID_PATTERN.match(face_id):
+        raise ValueError(f"Invalid face id: {face_id!r}")
+    root = os.path.realpath(DATASET_DIR)
+    path = os.path.join(DATASET_DIR, face_id + suffix)
+    if os.path.dirname(os.path.realpath(path)) != root:
+        raise ValueError(f"Invalid face id: {face_id!r}")
+    return path
+
+
+def user_folder(face_id):
+    """Folder of a capture saved before the packed archives (one image per frame)."""
+    return dataset_path(face_id)
+
+
+def archive_path(face_id):
+    return dataset_path(face_id, '.npz')
+
+
+def save_samples(face_id, faces, compress=None, **metadata):
+    """Write a user's normalized crops as one archive, replacing their previous capture.
+
+    The archive holds the crops as an (N, 200, 200) uint8 array and a JSON
+    metadata record, zlib-compressed if `compress` (default
+    config.DATASET_COMPRESS). It is written to a temp file and renamed over
+    the old one, so readers never see a half-written capture. Returns the
+    elapsed seconds.
+    """
+    if compress is None:
+        compress = config.DATASET_COMPRESS
+    start = time.perf_counter()
+    faces = np.asarray(faces, np.uint8)
+    metadata = {
+        'format': ARCHIVE_FORMAT,
+        'face_id': face_id,
+        'count': len(faces),
+        'size': list(FACE_SIZE),
+        'saved_at': time.time(),
+        **metadata,
+    }
+
+    path = archive_path(face_id)
+    tmp_path = dataset_path(face_id, '.npz.tmp')
+    os.makedirs(DATASET_DIR, exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        save = np.savez_compressed if compress else np.savez
+        save(f, faces=faces, metadata=np.array(json.dumps(metadata)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # The archive supersedes an older per-frame capture
+    folder = user_folder(face_id)
+    if os.path.isdir(folder):
+        try:
+            shutil.rmtree(folder)
+        except OSError as e:
+            logger.warning(f"Error removing the old capture folder of {face_id}: {str(e)}")
+    return time.perf_counter() - start
+
+
+def read_archive(face_id):
+    """(faces, metadata) of a user's archive; members are decompressed only when read."""
+    with np.load(archive_path(face_id)) as archive:
+        return archive['faces'], json.loads(str(archive['metadata']))
+
+
+def face_ids():
+    """Every user with a capture, in either format."""
+    ids = set()
+    if os.path.isdir(DATASET_DIR):
+        for name in os.listdir(DATASET_DIR):
+            if name.endswith('.npz'):
+                ids.add(name[:-len('.npz')])
+            elif os.path.isdir(os.path.join(DATASET_DIR, name)) and not name.endswith(('.tmp', '.old', '.migrated')):
+                ids.add(name)
+    return sorted(ids)
+
+
+def iter_samples(detector=None):
+    """Yield (face_id, samples) for every user, one user at a time.
+
+    Only one user's crops are in memory at once, so a full retrain or audit
+    does not need the whole dataset to fit. Users whose data can't be read
+    are logged and skipped.
+    """
+    for face_id in face_ids():
+        try:
+            yield face_id, load_samples(face_id, detector)
+        except Exception as e:
+            logger.warning(f"Skipping dataset of {face_id}: {str(e)}")
+
+
+def load_samples(face_id, detector=None):
+    """Read a user's crops back as FACE_SIZE samples.
+
+    Archives are read directly. A capture still stored as a folder is read
+    file by file: normalized crops (FACE_SIZE PNGs) are used as-is, older
+    padded JPEG crops are re-detected (with `detector`) and resized as before.
+    """
+    if os.path.exists(archive_path(face_id)):
+        faces, _ = read_archive(face_id)
+        if not len(faces):
+            raise ValueError("No valid face samples found in the training data")
+        return faces
+
+    folder = user_folder(face_id)
+    if not os.path.exists(folder):
+        raise ValueError(f"No training data found for user {face_id}")
+
+    samples = []
+    for image_file in sorted(os.listdir(folder)):
+        if not image_file.endswith(('.jpg', '.jpeg', '.png')):
+            continue
+
+        face_array = cv2.imread(os.path.join(folder, image_file), cv2.IMREAD_GRAYSCALE)
+        if face_array is None:
+            continue
+
+        if image_file.endswith('.png') and face_array.shape == FACE_SIZE[::-1]:
+            samples.append(face_array)
+            continue
+        if detector is None:
+            continue
+
+        # Legacy padded crop: find the face again and resize it
+        faces = detector.detectMultiScale(face_array, scaleFactor=1.1, minNeighbors=5, minSize=(120, 120))
+        for (x, y, w, h) in faces:
+            samples.append(cv2.resize(face_array[y:y+h, x:x+w], FACE_SIZE))
+
+    if not samples:
+        raise ValueError("No valid face samples found in the training data")
+    return samples
+
+
+def migrate_folder(face_id, detector, keep=False):
+    """Pack a per-frame capture folder into an archive. Returns the number of crops packed."""
+    samples = load_samples(face_id, detector)
+    folder = user_folder(face_id)
+    source_files = len(os.listdir(folder))
+    if keep:
+        # save_samples removes the folder; park it so it survives
+        kept = dataset_path(face_id, '.migrated')
+        os.replace(folder, kept)
+    save_samples(face_id, samples, migrated_from='folder', source_files=source_files)
+    return len(samples)
@@ -0,0 +1,172 @@
+import logging
+import os
+import pickle
+import threading
+import cv2
+import numpy as np
+from lbph import HISTOGRAM_SIZE, HistogramStore, spatial_histogram
+from model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+# Models saved before the segment store, converted on first start
+LEGACY_NPZ_PATH = 'trainer/histograms.npz'
+LEGACY_USER_DATA_PATH = 'trainer/user_data.pkl'
+LEGACY_MODEL_PATH = 'trainer/trainer.yml'
+
+model_store = ModelStore('trainer')
+
+
+class ModelSnapshot:
+    """A published version of the model: histograms, label -> face_id map and version.
+
+    Snapshots are never changed after they are published. Training builds the
+    next one from a clone and swaps the reference, so a prediction that started
+    on a snapshot finishes on it while the next version is being built.
+    """
+
+    def __init__(self, version, store, user_data):
+        self.version = version
+        self.store = store
+        # Keys are str(label), as in the old user_data.pkl
+        self.user_data = user_data
+        self.labels_by_face_id = {face_id.lower(): int(label) for label, face_id in user_data.items()}
+
+    def verify(self, histograms, face_id):
+        """1:1 - distance of each probe histogram to the claimed user's model, or None if not enrolled."""
+        label = self.labels_by_face_id.get(face_id.lower())
+        if label is None:
+            return [None for _ in histograms]
+        return [(self.user_data.get(str(label), "Unknown"), self.store.verify(probe, label)) for probe in histograms]
+
+    def identify(self, histograms, k=1):
+        """1:N - the k nearest enrolled users of each probe histogram, as (face_id, distance) pairs."""
+        return [
+            [(self.user_data.get(str(label), "Unknown"), distance) for label, distance in matches]
+            for matches in self.store.match(histograms, k=k)
+        ]
+
+
+_snapshot = ModelSnapshot(0, HistogramStore(), {})
+# Serializes writers (enrollment, removal, reloads); readers never take it
+_write_lock = threading.Lock()
+
+
+def current():
+    """The latest published model snapshot."""
+    return _snapshot
+
+
+def _publish(store, user_data):
+    """Swap in a new snapshot; a single reference assignment, so readers see the old or the new one."""
+    global _snapshot
+    _snapshot = ModelSnapshot(model_store.manifest['version'], store, user_data)
+
+
+def load():
+    """Load the model from the manifest, converting a legacy model on first start."""
+    os.makedirs('trainer', exist_ok=True)
+    with _write_lock:
+        if model_store.exists():
+            _load_segments()
+        else:
+            _migrate_legacy_model()
+
+
+def _load_segments():
+    """Map the manifest's segments read-only instead of reading them into memory."""
+    segments, deleted_labels, user_data = model_store.load()
+    store = HistogramStore.from_segments(segments)
+    for label in deleted_labels:
+        store.remove(int(label))
+    _publish(store, user_data)
+
+
+def _migrate_legacy_model():
+    user_data = {}
+    if os.path.exists(LEGACY_USER_DATA_PATH):
+        with open(LEGACY_USER_DATA_PATH, 'rb') as f:
+            user_data = pickle.load(f)
+
+    if os.path.exists(LEGACY_NPZ_PATH):
+        with np.load(LEGACY_NPZ_PATH) as model:
+            store = HistogramStore.from_arrays(model['histograms'], model['labels'])
+    elif os.path.exists(LEGACY_MODEL_PATH):
+        store = _load_legacy_model(LEGACY_MODEL_PATH)
+    else:
+        return
+
+    # The manifest now holds the label map, so the two can never disagree
+    model_store.save_all(*store.to_arrays(), user_data)
+    _publish(store, user_data)
+    logger.info(f"Converted the legacy model to {model_store.manifest_path}")
+
+
+def _load_legacy_model(path):
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(path)
+    histograms = np.asarray(recognizer.getHistograms(), np.float32).reshape(-1, HISTOGRAM_SIZE)
+    labels = recognizer.getLabels().ravel().astype(np.int32)
+    order = np.argsort(labels, kind='stable')
+    return HistogramStore.from_arrays(histograms[order], labels[order])
+
+
+def enroll(face_id, faces):
+    """Add a user's preprocessed 200x200 faces, replacing any earlier enrollment. Returns the user count."""
+    return enroll_many({face_id: faces})
+
+
+def enroll_many(faces_by_user):
+    """Enroll several users in one model update: one segment, one manifest swap, one new version."""
+    histograms_by_user = {
+        face_id: np.stack([spatial_histogram(face) for face in faces])
+        for face_id, faces in faces_by_user.items()
+    }
+    with _write_lock:
+        # Build the next version off to the side; predictions keep using the current one
+        store, user_data = _snapshot.store.clone(), dict(_snapshot.user_data)
+        replaced, enrollments = [], []
+        for face_id, histograms in histograms_by_user.items():
+            replaced += _remove_labels(store, user_data, face_id)
+            label = max([store.next_label(), model_store.manifest['next_label']] + [int(label) + 1 for label in user_data])
+            store.add(label, histograms)
+            user_data[str(label)] = face_id
+            enrollments.append((label, histograms, face_id))
+
+        # Only the new users' histograms are written, then the manifest is swapped
+        model_store.append_batch(enrollments, replaced)
+        _publish(store, user_data)
+        _maintain()
+        return len(user_data)
+
+
+def remove_user(face_id):
+    """Forget a user's histograms. Returns False if they were never enrolled."""
+    with _write_lock:
+        store, user_data = _snapshot.store.clone(), dict(_snapshot.user_data)
+        removed = _remove_labels(store, user_data, face_id)
+        if not removed:
+            return False
+        model_store.remove(removed)
+        _publish(store, user_data)
+        _maintain()
+        return True
+
+
+def _maintain():
+    if model_store.needs_compaction(_snapshot.store.dead_ratio()):
+        model_store.compact_in_background(on_done=_reload_after_compaction)
+
+
+def _reload_after_compaction():
+    """Re-map the compacted segments so removed users' rows and old files are released."""
+    with _write_lock:
+        _load_segments()
+
+
+def _remove_labels(store, user_data, face_id):
+    labels = [int(label) for label, enrolled in user_data.items() if enrolled == face_id]
+    for label in labels:
+        store.remove(label)
+        del user_data[str(label)]
+    return labels
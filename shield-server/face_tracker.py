@@ -0,0 +1,93 @@
+import threading
+import time
+
+
+class TrackingStats:
+    """Counts and time spent in full-frame scans vs. ROI searches."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            'full_scans': 0, 'full_scan_seconds': 0.0,
+            'roi_scans': 0, 'roi_scan_seconds': 0.0,
+            'lost': 0,
+        }
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self._stats[f'{kind}s'] += 1
+            self._stats[f'{kind}_seconds'] += seconds
+
+    def lost(self):
+        with self._lock:
+            self._stats['lost'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        for kind in ('full_scan', 'roi_scan'):
+            count, seconds = stats[f'{kind}s'], stats.pop(f'{kind}_seconds')
+            stats[f'avg_{kind}_ms'] = 1000 * seconds / count if count else 0.0
+        return stats
+
+
+tracking_stats = TrackingStats()
+
+
+class FaceTracker:
+    """Follows a single face between frames of one stream.
+
+    After a full scan finds exactly one face, the next frames are searched
+    only inside the last box expanded by `roi_margin`, for faces within
+    `scale_range` of its size. A full scan runs again when the face is lost,
+    or every `rescan_interval` frames so new faces entering the frame are
+    still seen. Boxes are in the coordinates of the image passed in.
+    """
+
+    def __init__(self, rescan_interval=10, roi_margin=0.5, scale_range=0.3):
+        self.rescan_interval = rescan_interval
+        self.roi_margin = roi_margin
+        self.scale_range = scale_range
+        self.box = None
+        self.frames_since_scan = 0
+
+    def detect(self, image, detector, min_size, **kwargs):
+        faces = None
+        if self.box is not None and self.frames_since_scan < self.rescan_interval:
+            faces = self._search_roi(image, detector, min_size, **kwargs)
+            if faces is None:
+                tracking_stats.lost()
+
+        if faces is None:
+            start = time.perf_counter()
+            faces = [tuple(int(v) for v in face) for face in detector.detectMultiScale(image, minSize=min_size, **kwargs)]
+            tracking_stats.record('full_scan', time.perf_counter() - start)
+            self.frames_since_scan = 0
+
+        # Only a lone face is tracked; with several faces every frame is a full scan
+        self.box = faces[0] if len(faces) == 1 else None
+        self.frames_since_scan += 1
+        return faces
+
+    def _search_roi(self, image, detector, min_size, **kwargs):
+        """Search around the last box; return the face in image coordinates, or None if lost."""
+        start = time.perf_counter()
+        x, y, w, h = self.box
+        dx, dy = int(w * self.roi_margin), int(h * self.roi_margin)
+        x0, y0 = max(0, x - dx), max(0, y - dy)
+        x1, y1 = min(image.shape[1], x + w + dx), min(image.shape[0], y + h + dy)
+
+        size = max(w, h)
+        lo = max(min_size[0], int(size * (1 - self.scale_range)))
+        hi = int(size * (1 + self.scale_range))
+        faces = detector.detectMultiScale(image[y0:y1, x0:x1], minSize=(lo, lo), maxSize=(hi, hi), **kwargs)
+        tracking_stats.record('roi_scan', time.perf_counter() - start)
+
+        if len(faces) != 1:
+            return None
+        fx, fy, fw, fh = (int(v) for v in faces[0])
+        return [(fx + x0, fy + y0, fw, fh)]
+
+    def reset(self):
+        self.box = None
+        self.frames_since_scan = 0
@@ -1,7 +1,26 @@
+import threading
 import firebase_admin
 from firebase_admin import credentials,firestore
 
-# Initialize Firebase Admin
-cred = credentials.Certificate('./firebase_service.json')
-firebase_admin.initialize_app(cred)
-db = firestore.client()
\ No newline at end of file
+_lock = threading.Lock()
+
+
+def app():
+    """The Firebase Admin app, initialized from the service account on first use.
+
+    Nothing touches the service account at import, so the server can start
+    without it (the memory storage backend with unsigned tokens needs none).
+    """
+    with _lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            cred = credentials.Certificate('./firebase_service.json')
+            return firebase_admin.initialize_app(cred)
+
+
+def __getattr__(name):
+    # `from firebase_service import db` still works, connecting on first import of it
+    if name == 'db':
+        return firestore.client(app())
+    raise AttributeError(name)
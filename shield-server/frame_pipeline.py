@@ -0,0 +1,132 @@
+import base64
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class TransportStats:
+    """Wire size and decode time per frame transport ('binary' or 'data_url')."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, transport, nbytes, seconds):
+        with self._lock:
+            entry = self._stats.setdefault(transport, {'frames': 0, 'bytes': 0, 'decode_seconds': 0.0})
+            entry['frames'] += 1
+            entry['bytes'] += nbytes
+            entry['decode_seconds'] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                transport: {
+                    'frames': entry['frames'],
+                    'avg_bytes_per_frame': entry['bytes'] / entry['frames'],
+                    'avg_decode_ms': 1000 * entry['decode_seconds'] / entry['frames'],
+                }
+                for transport, entry in self._stats.items()
+            }
+
+
+transport_stats = TransportStats()
+
+
+def frame_buffer(image_data):
+    """Return the encoded image bytes and the transport they arrived on.
+
+    Binary Socket.IO attachments arrive as `bytes` and are returned as-is. The
+    legacy `data:image/jpeg;base64,...` string is still accepted.
+    """
+    if isinstance(image_data, (bytes, bytearray, memoryview)):
+        return image_data, 'binary'
+    if isinstance(image_data, str):
+        return base64.b64decode(image_data[image_data.index(',') + 1:]), 'data_url'
+    raise ValueError("Invalid image data")
+
+
+# imdecode flags for a grayscale decode at 1/scale resolution
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+class Frame:
+    """An encoded frame that is decoded lazily, at the resolution each stage needs.
+
+    `mode='color'` keeps the original full BGR decode + cvtColor. `mode='gray'`
+    decodes straight to grayscale, and with `scale` > 1 the detection image is
+    decoded at reduced resolution by libjpeg (IMREAD_REDUCED_GRAYSCALE_*). The
+    full-resolution grayscale image is then only decoded for the face crops.
+    """
+
+    def __init__(self, image_data, mode='gray', scale=1):
+        if scale not in REDUCED_GRAYSCALE_FLAGS:
+            raise ValueError(f"Unsupported detection scale: {scale}")
+        buffer, self.transport = frame_buffer(image_data)
+        # np.frombuffer is a view over the received buffer, not a copy
+        self._encoded = np.frombuffer(buffer, np.uint8)
+        self._nbytes = len(image_data)
+        self.mode = mode
+        self.scale = scale if mode == 'gray' else 1
+        self._gray = None
+        self._detection_gray = None
+        self._decode_seconds = 0.0
+
+    def _decode(self, flags):
+        start = time.perf_counter()
+        img = cv2.imdecode(self._encoded, flags)
+        self._decode_seconds += time.perf_counter() - start
+        if img is None:
+            raise ValueError("Invalid image data")
+        return img
+
+    def gray(self):
+        """Full-resolution grayscale image."""
+        if self._gray is None:
+            if self.mode == 'color':
+                self._gray = cv2.cvtColor(self._decode(cv2.IMREAD_COLOR), cv2.COLOR_BGR2GRAY)
+            else:
+                self._gray = self._decode(cv2.IMREAD_GRAYSCALE)
+        return self._gray
+
+    def detection_gray(self):
+        """Grayscale image at 1/scale resolution, used only for detection."""
+        if self._detection_gray is None:
+            if self.scale == 1:
+                self._detection_gray = self.gray()
+            else:
+                self._detection_gray = self._decode(REDUCED_GRAYSCALE_FLAGS[self.scale])
+        return self._detection_gray
+
+    def detect_faces(self, detector, min_size=(120, 120), tracker=None, **kwargs):
+        """Run `detector` on the detection image and return boxes in full-resolution coordinates.
+
+        With a `FaceTracker` the search is narrowed to the region around the
+        face found in the stream's previous frames.
+        """
+        small = self.detection_gray()
+        min_size = (min_size[0] // self.scale, min_size[1] // self.scale)
+        if tracker is not None:
+            faces = tracker.detect(small, detector, min_size, **kwargs)
+        else:
+            faces = detector.detectMultiScale(small, minSize=min_size, **kwargs)
+        return [tuple(int(v) * self.scale for v in face) for face in faces]
+
+    def record_stats(self):
+        transport_stats.record(self.transport, self._nbytes, self._decode_seconds)
+
+
+
+# Size of the face crops the LBPH model is trained and matched on
+FACE_SIZE = (200, 200)
+
+
+def normalize_face(face_roi):
+    """Resize a tight face crop to FACE_SIZE and equalize it, as both enrollment and recognition do."""
+    return cv2.equalizeHist(cv2.resize(face_roi, FACE_SIZE))
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+
+
+def measure(face_roi):
+    """Cheap quality measures of a grayscale face crop, taken before equalization.
+
+    - sharpness: variance of the Laplacian (low when the face is blurred)
+    - brightness: mean intensity
+    - dhash: 64-bit difference hash, close for near-identical frames
+    """
+    small = cv2.resize(face_roi, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return {
+        'sharpness': float(cv2.Laplacian(face_roi, cv2.CV_64F).var()),
+        'brightness': float(face_roi.mean()),
+        'dhash': int(np.packbits(bits).view('>u8')[0]),
+    }
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class QualityGate:
+    """Rejects low-value enrollment frames and decides when a capture is diverse enough.
+
+    A frame is rejected when it is blurry, too dark or too bright, or when its
+    dHash is within `duplicate_distance` bits of a frame already accepted.
+    Accepted frames at least `diverse_distance` bits away from every earlier
+    distinct frame count towards `diversity_target`; once that is met (and at
+    least `min_frames` were accepted) the capture can end early.
+    """
+
+    def __init__(self, min_sharpness=50.0, brightness_range=(40, 215), duplicate_distance=3,
+                 diverse_distance=10, diversity_target=25, min_frames=40):
+        self.min_sharpness = min_sharpness
+        self.brightness_range = brightness_range
+        self.duplicate_distance = duplicate_distance
+        self.diverse_distance = diverse_distance
+        self.diversity_target = diversity_target
+        self.min_frames = min_frames
+
+    def check(self, quality, accepted_hashes):
+        """Return the reason to reject a frame, or None to accept it."""
+        if quality['sharpness'] < self.min_sharpness:
+            return 'blurry'
+        if quality['brightness'] < self.brightness_range[0]:
+            return 'too_dark'
+        if quality['brightness'] > self.brightness_range[1]:
+            return 'too_bright'
+        if any(hamming(quality['dhash'], h) <= self.duplicate_distance for h in accepted_hashes):
+            return 'duplicate'
+        return None
+
+    def is_distinct(self, quality, distinct_hashes):
+        return all(hamming(quality['dhash'], h) >= self.diverse_distance for h in distinct_hashes)
+
+    def is_complete(self, accepted, distinct):
+        return accepted >= self.min_frames and distinct >= self.diversity_target
+
+
+# Messages shown to the user for each rejection reason
+REJECTION_MESSAGES = {
+    'blurry': "Frame is blurry, please hold still",
+    'too_dark': "Frame is too dark, please add more light",
+    'too_bright': "Frame is too bright, please reduce the light",
+    'duplicate': "Frame is almost identical to a previous one, please move your head slightly",
+}
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from metrics import percentiles
+
+logger = logging.getLogger(__name__)
+
+
+class FrameWorkerPool:
+    """Runs the OpenCV frame pipeline off the Socket.IO handlers.
+
+    Each (sid, event) pair gets its own bounded queue. At most one job per
+    queue runs at a time, so frames of one stream stay in order, and after
+    each job the queue goes to the back of the pool's line so one busy camera
+    can't starve the others. When a queue is full the `policy` decides which
+    frame is dropped: 'drop_oldest' (keep the freshest frames) or
+    'drop_newest' (reject the incoming frame).
+
+    Streams submitted with `coalesce=True` are latest-frame-wins: while a
+    frame is being processed only the newest incoming frame is kept, so the
+    result latency stays bounded by about two processing times under overload.
+    """
+
+    def __init__(self, workers, queue_depth, policy='drop_oldest'):
+        if policy not in ('drop_oldest', 'drop_newest'):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.policy = policy
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='frame-worker')
+        self._queues = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        # Recent enqueue-to-result latencies per event, for percentiles
+        self._latencies = {}
+        self._stats = {
+            'submitted': 0,
+            'processed': 0,
+            'errors': 0,
+            'dropped': {},
+            'stale_dropped': {},
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def submit(self, sid, kind, fn, *args, depth=None, coalesce=False):
+        """Queue `fn(*args)` for the (sid, kind) stream. Returns False if the frame was dropped."""
+        key = (sid, kind)
+        limit = depth or self.queue_depth
+        with self._lock:
+            self._stats['submitted'] += 1
+            queue = self._queues.setdefault(key, deque())
+            if coalesce:
+                # Latest frame wins: anything still waiting is already stale
+                stale = len(queue)
+                if stale:
+                    queue.clear()
+                    self._stats['stale_dropped'][kind] = self._stats['stale_dropped'].get(kind, 0) + stale
+            elif len(queue) >= limit:
+                self._stats['dropped'][kind] = self._stats['dropped'].get(kind, 0) + 1
+                if self.policy == 'drop_newest':
+                    return False
+                queue.popleft()
+            queue.append((time.perf_counter(), fn, args))
+            if key in self._active:
+                return True
+            self._active.add(key)
+        self._executor.submit(self._drain, key)
+        return True
+
+    def _drain(self, key):
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                self._active.discard(key)
+                return
+            enqueued_at, fn, args = queue.popleft()
+
+        wait = time.perf_counter() - enqueued_at
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Frame job {key[1]} failed: {str(e)}")
+            with self._lock:
+                self._stats['errors'] += 1
+
+        latency = time.perf_counter() - enqueued_at
+        with self._lock:
+            self._latencies.setdefault(key[1], deque(maxlen=1000)).append(latency)
+            self._stats['processed'] += 1
+            self._stats['wait_seconds_total'] += wait
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], wait)
+            if not self._queues.get(key):
+                self._active.discard(key)
+                return
+        # More frames waiting: go to the back of the line behind other sessions
+        self._executor.submit(self._drain, key)
+
+    def close_session(self, sid):
+        """Forget every queued frame of a disconnected client."""
+        with self._lock:
+            for key in [key for key in self._queues if key[0] == sid]:
+                del self._queues[key]
+
+    def stats(self):
+        with self._lock:
+            processed = self._stats['processed']
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'policy': self.policy,
+                'submitted': self._stats['submitted'],
+                'processed': processed,
+                'errors': self._stats['errors'],
+                'dropped': dict(self._stats['dropped']),
+                'stale_dropped': dict(self._stats['stale_dropped']),
+                'latency_ms': {kind: percentiles(samples) for kind, samples in self._latencies.items()},
+                'queued': sum(len(queue) for queue in self._queues.values()),
+                'avg_wait_ms': 1000 * self._stats['wait_seconds_total'] / processed if processed else 0.0,
+                'max_wait_ms': 1000 * self._stats['wait_seconds_max'],
+            }
@@ -0,0 +1,255 @@
+import numpy as np
+
+# Parameters of cv2.face.LBPHFaceRecognizer_create() defaults
+RADIUS = 1
+NEIGHBORS = 8
+GRID_X = 8
+GRID_Y = 8
+NUM_PATTERNS = 2 ** NEIGHBORS
+HISTOGRAM_SIZE = GRID_X * GRID_Y * NUM_PATTERNS
+
+
+def _neighbor_weights():
+    """Sampling offsets and bilinear weights of each circular neighbor, as in OpenCV's elbp."""
+    neighbors = []
+    for n in range(NEIGHBORS):
+        x = np.float32(RADIUS * np.cos(2.0 * np.pi * n / NEIGHBORS))
+        y = np.float32(-RADIUS * np.sin(2.0 * np.pi * n / NEIGHBORS))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        ty, tx = np.float32(y - fy), np.float32(x - fx)
+        weights = (
+            np.float32((1 - tx) * (1 - ty)), np.float32(tx * (1 - ty)),
+            np.float32((1 - tx) * ty), np.float32(tx * ty),
+        )
+        neighbors.append(((fy, fx), (fy, cx), (cy, fx), (cy, cx), weights))
+    return neighbors
+
+
+_NEIGHBORS = _neighbor_weights()
+
+
+def lbp_image(gray):
+    """Extended (circular) LBP codes of a grayscale image."""
+    src = gray.astype(np.float32)
+    rows, cols = src.shape
+    r = RADIUS
+    center = src[r:rows - r, r:cols - r]
+    codes = np.zeros(center.shape, np.int32)
+
+    def shifted(dy, dx):
+        return src[r + dy:rows - r + dy, r + dx:cols - r + dx]
+
+    for n, (p1, p2, p3, p4, (w1, w2, w3, w4)) in enumerate(_NEIGHBORS):
+        t = w1 * shifted(*p1) + w2 * shifted(*p2) + w3 * shifted(*p3) + w4 * shifted(*p4)
+        codes |= (((t > center) | (np.abs(t - center) < np.finfo(np.float32).eps)).astype(np.int32) << n)
+    return codes
+
+
+def spatial_histogram(face):
+    """LBPH feature vector of a preprocessed face, laid out like OpenCV's histograms."""
+    codes = lbp_image(face)
+    height, width = codes.shape[0] // GRID_Y, codes.shape[1] // GRID_X
+    cells = codes[:height * GRID_Y, :width * GRID_X].reshape(GRID_Y, height, GRID_X, width).swapaxes(1, 2)
+    cells = cells.reshape(GRID_Y * GRID_X, height * width)
+
+    # One bincount over all cells at once, offset per cell
+    offsets = (np.arange(GRID_Y * GRID_X) * NUM_PATTERNS)[:, None]
+    hist = np.bincount((cells + offsets).ravel(), minlength=HISTOGRAM_SIZE).astype(np.float32)
+    return hist / np.float32(height * width)
+
+
+def chi_square(probe, histograms):
+    """Distances between one probe and each row of `histograms` (OpenCV's HISTCMP_CHISQR_ALT)."""
+    diff = histograms - probe
+    total = histograms + probe
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(total > 0, diff * diff / total, 0)
+    return 2 * terms.sum(axis=1)
+
+
+class HistogramStore:
+    """Enrolled LBPH histograms as float32 matrices with label arrays.
+
+    The rows loaded from disk are kept as read-only blocks (typically
+    memory-mapped segments, so pages are only read when touched and are shared
+    between worker processes); new enrollments go to a growable in-memory tail.
+    Rows are appended one enrollment at a time, so labels stay sorted across
+    blocks and each label's rows are contiguous. Removing a user only forgets
+    its row range (O(1)); the rows are skipped by matching until the model
+    store compacts its segments and the model is reloaded.
+    """
+
+    def __init__(self, capacity=256):
+        self._blocks = []
+        self._histograms = np.empty((capacity, HISTOGRAM_SIZE), np.float32)
+        self._labels = np.empty(capacity, np.int32)
+        self._count = 0
+        # label -> (block index, start, stop); block index None is the in-memory tail
+        self._label_rows = {}
+        self._total_rows = 0
+        self._dead_rows = 0
+
+    def __len__(self):
+        return self._total_rows - self._dead_rows
+
+    def __contains__(self, label):
+        return label in self._label_rows
+
+    def clone(self):
+        """A copy that can be changed without affecting this store, sharing its row buffers.
+
+        Blocks are read-only and shared. The tail buffer is shared too: the
+        clone only writes rows past this store's count (or into a new buffer
+        when it grows), which this store never reads.
+        """
+        store = HistogramStore.__new__(HistogramStore)
+        store._blocks = list(self._blocks)
+        store._histograms = self._histograms
+        store._labels = self._labels
+        store._count = self._count
+        store._label_rows = dict(self._label_rows)
+        store._total_rows = self._total_rows
+        store._dead_rows = self._dead_rows
+        return store
+
+    def _parts(self):
+        """(histograms, labels) of every block and the tail, in row order."""
+        return self._blocks + [(self._histograms[:self._count], self._labels[:self._count])]
+
+    def _rows_of(self, label):
+        block, start, stop = self._label_rows[label]
+        histograms = self._blocks[block][0] if block is not None else self._histograms
+        return histograms[start:stop]
+
+    def next_label(self):
+        for _, labels in reversed(self._parts()):
+            if len(labels):
+                return int(labels[-1]) + 1
+        return 0
+
+    def add(self, label, histograms):
+        """Append one user's histograms under a label greater than every existing one."""
+        histograms = np.asarray(histograms, np.float32).reshape(-1, HISTOGRAM_SIZE)
+        if label < self.next_label():
+            raise ValueError(f"Label {label} must be greater than existing labels")
+
+        needed = self._count + len(histograms)
+        if needed > len(self._histograms):
+            capacity = max(needed, 2 * len(self._histograms))
+            grown = np.empty((capacity, HISTOGRAM_SIZE), np.float32)
+            grown[:self._count] = self._histograms[:self._count]
+            self._histograms = grown
+            labels = np.empty(capacity, np.int32)
+            labels[:self._count] = self._labels[:self._count]
+            self._labels = labels
+
+        self._histograms[self._count:needed] = histograms
+        self._labels[self._count:needed] = label
+        self._label_rows[label] = (None, self._count, needed)
+        self._count = needed
+        self._total_rows += len(histograms)
+
+    def remove(self, label):
+        """Logically delete a label; its rows are reclaimed when the model store compacts."""
+        rows = self._label_rows.pop(label, None)
+        if rows is None:
+            return False
+        self._dead_rows += rows[2] - rows[1]
+        return True
+
+    def dead_ratio(self):
+        """Fraction of the stored rows that belong to removed labels."""
+        return self._dead_rows / self._total_rows if self._total_rows else 0.0
+
+    def _index_block(self, block, labels):
+        if not len(labels):
+            return
+        labels = np.asarray(labels)
+        starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+        stops = np.r_[starts[1:], len(labels)]
+        for start, stop in zip(starts, stops):
+            self._label_rows[int(labels[start])] = (block, int(start), int(stop))
+
+    def verify(self, probe, label):
+        """Smallest distance from `probe` to one label's histograms, or None if it isn't enrolled."""
+        if label not in self._label_rows:
+            return None
+        return float(chi_square(probe, self._rows_of(label)).min())
+
+    def match(self, probes, k=1):
+        """Top-k (label, distance) pairs for each probe, nearest first.
+
+        `probes` is one histogram or a (P, HISTOGRAM_SIZE) batch; a label's
+        distance is that of its nearest histogram.
+        """
+        probes = np.asarray(probes, np.float32).reshape(-1, HISTOGRAM_SIZE)
+        if not self._label_rows:
+            return [[] for _ in probes]
+
+        # Distances to every row, computed in chunks to bound the temporaries
+        distances = np.empty((len(probes), self._total_rows), np.float32)
+        chunk = max(1, _MATCH_CHUNK_ELEMENTS // (len(probes) * HISTOGRAM_SIZE))
+        offset = 0
+        for histograms, _ in self._parts():
+            for start in range(0, len(histograms), chunk):
+                stop = min(len(histograms), start + chunk)
+                distances[:, offset + start:offset + stop] = _chi_square_batch(probes, histograms[start:stop])
+            offset += len(histograms)
+
+        # Nearest row per label (labels are sorted, so each label is one segment)
+        labels = np.concatenate([labels for _, labels in self._parts()])
+        starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+        per_label = np.minimum.reduceat(distances, starts, axis=1)
+        segment_labels = labels[starts]
+        live = np.array([int(label) in self._label_rows for label in segment_labels])
+        per_label, segment_labels = per_label[:, live], segment_labels[live]
+
+        k = min(k, len(segment_labels))
+        top = np.argpartition(per_label, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(per_label, top):
+            candidates = candidates[np.argsort(row[candidates])]
+            results.append([(int(segment_labels[i]), float(row[i])) for i in candidates])
+        return results
+
+    def to_arrays(self):
+        """Live histograms and labels as one (copied) matrix and label array."""
+        live = sorted(self._label_rows)
+        histograms = [self._rows_of(label) for label in live]
+        labels = [np.full(len(rows), label, np.int32) for label, rows in zip(live, histograms)]
+        if not live:
+            return np.empty((0, HISTOGRAM_SIZE), np.float32), np.empty(0, np.int32)
+        return np.concatenate(histograms), np.concatenate(labels)
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build a store over read-only (histograms, labels) segments without copying them."""
+        store = cls(capacity=1)
+        for histograms, labels in segments:
+            if not len(labels):
+                continue
+            if (len(labels) > 1 and np.any(np.diff(labels) < 0)) or labels[0] < store.next_label():
+                raise ValueError("Segment labels must be sorted and increase across segments")
+            store._index_block(len(store._blocks), labels)
+            store._blocks.append((histograms, labels))
+            store._total_rows += len(labels)
+        return store
+
+    @classmethod
+    def from_arrays(cls, histograms, labels):
+        order = np.argsort(labels, kind='stable')
+        return cls.from_segments([(np.asarray(histograms, np.float32)[order], np.asarray(labels, np.int32)[order])])
+
+
+# Elements in each (probes, rows, HISTOGRAM_SIZE) temporary while matching
+_MATCH_CHUNK_ELEMENTS = 2 ** 22
+
+
+def _chi_square_batch(probes, histograms):
+    """(P, N) distances between every probe and every histogram."""
+    diff = histograms[None, :, :] - probes[:, None, :]
+    total = histograms[None, :, :] + probes[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(total > 0, diff * diff / total, 0)
+    return 2 * terms.sum(axis=2)
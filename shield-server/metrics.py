@@ -0,0 +1,7 @@
+def percentiles(samples):
+    """p50, p95 and max in milliseconds of durations given in seconds ({} if there are none)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    pick = lambda q: 1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'max': 1000 * ordered[-1]}
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStore:
+    """Append-only, versioned persistence of the enrolled histograms.
+
+    Each enrollment is written as a new segment (a histogram matrix and a label
+    array) and then published by atomically replacing `manifest.json`, which
+    lists the live segments, the deleted labels and the label -> face_id map.
+    The model files and the label map therefore always change together, and an
+    enrollment costs a write of one user's histograms instead of the whole
+    model. `compact()` merges the segments and drops deleted labels.
+    """
+
+    def __init__(self, directory='trainer'):
+        self.directory = directory
+        self.segment_dir = os.path.join(directory, 'segments')
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self._lock = threading.Lock()
+        self._compacting = False
+        self.manifest = {'version': 0, 'next_label': 0, 'segments': [], 'deleted_labels': [], 'user_data': {}}
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def load(self):
+        """Read the manifest and memory-map the live segments read-only.
+
+        Returns (segments, deleted_labels, user_data) where segments is a list
+        of (histograms, labels) arrays. Nothing is read eagerly: pages are
+        loaded when matching touches them and are shared through the page
+        cache by every worker process that maps the same files.
+        """
+        with open(self.manifest_path) as f:
+            self.manifest = json.load(f)
+        self._remove_orphans()
+
+        segments = [self._read_segment(name, mmap_mode='r') for name in self.manifest['segments']]
+        return segments, list(self.manifest['deleted_labels']), dict(self.manifest['user_data'])
+
+    def append_batch(self, enrollments, replaced_labels=()):
+        """Persist several (label, histograms, face_id) enrollments as one segment and one manifest swap."""
+        with self._lock:
+            version = self.manifest['version'] + 1
+            name = f"seg-{version:06d}"
+            enrollments = sorted(enrollments, key=lambda enrollment: enrollment[0])
+            self._write_segment(
+                name,
+                np.concatenate([histograms for _, histograms, _ in enrollments]),
+                np.concatenate([np.full(len(histograms), label, np.int32) for label, histograms, _ in enrollments])
+            )
+
+            manifest = self._next_manifest(version)
+            manifest['segments'].append(name)
+            for replaced in replaced_labels:
+                manifest['deleted_labels'].append(int(replaced))
+                manifest['user_data'].pop(str(replaced), None)
+            for label, _, face_id in enrollments:
+                manifest['next_label'] = max(manifest['next_label'], label + 1)
+                manifest['user_data'][str(label)] = face_id
+            self._publish(manifest)
+
+    def remove(self, labels):
+        """Mark labels deleted; their rows are dropped by the next compaction."""
+        with self._lock:
+            manifest = self._next_manifest(self.manifest['version'] + 1)
+            for label in labels:
+                manifest['deleted_labels'].append(int(label))
+                manifest['user_data'].pop(str(label), None)
+            self._publish(manifest)
+
+    def save_all(self, histograms, labels, user_data):
+        """Write a complete model as a single segment (used for migrations and full retrains)."""
+        with self._lock:
+            name = f"seg-{self.manifest['version'] + 1:06d}"
+            self._write_segment(name, histograms, np.asarray(labels, np.int32))
+            self._replace_all(name, user_data)
+
+    def save_all_streamed(self, blocks, user_data):
+        """Like save_all, for (label, histograms) blocks arriving in increasing label order.
+
+        Rows are spooled to disk as they arrive, so a full rebuild never holds
+        the whole model in memory. Returns the number of rows written.
+        """
+        with self._lock:
+            name = f"seg-{self.manifest['version'] + 1:06d}"
+            histograms_path, labels_path = self._segment_paths(name)
+            os.makedirs(self.segment_dir, exist_ok=True)
+
+            labels, width = [], None
+            spool_path = histograms_path + '.spool'
+            with open(spool_path, 'wb') as spool:
+                for label, histograms in blocks:
+                    histograms = np.ascontiguousarray(histograms, np.float32)
+                    width = histograms.shape[1]
+                    spool.write(histograms.tobytes())
+                    labels.append(np.full(len(histograms), label, np.int32))
+            labels = np.concatenate(labels) if labels else np.empty(0, np.int32)
+
+            # The .npy header needs the row count, so it is written in front of the spooled rows
+            with open(histograms_path, 'wb') as f, open(spool_path, 'rb') as spool:
+                np.lib.format.write_array_header_1_0(f, {
+                    'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                    'fortran_order': False,
+                    'shape': (len(labels), width or 0),
+                })
+                shutil.copyfileobj(spool, f, 16 * 2**20)
+                f.flush()
+                os.fsync(f.fileno())
+            os.remove(spool_path)
+            with open(labels_path, 'wb') as f:
+                np.save(f, labels)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._replace_all(name, user_data)
+            return len(labels)
+
+    def _replace_all(self, name, user_data):
+        """Publish `name` as the only segment, with a fresh label map."""
+        old_segments = list(self.manifest['segments'])
+        manifest = self._next_manifest(self.manifest['version'] + 1)
+        manifest['segments'] = [name]
+        manifest['deleted_labels'] = []
+        manifest['user_data'] = {str(label): face_id for label, face_id in user_data.items()}
+        manifest['next_label'] = max([manifest['next_label']] + [int(label) + 1 for label in user_data])
+        self._publish(manifest)
+        self._delete_segments(old_segments)
+
+    def needs_compaction(self, dead_ratio, max_segments=16, max_dead_ratio=0.25):
+        """True once there are too many segments, or too many rows (`dead_ratio`) of deleted labels.
+
+        Until then deleted labels are only skipped by matching, so removing or
+        re-enrolling a user doesn't rewrite the whole model.
+        """
+        return len(self.manifest['segments']) > max_segments or dead_ratio > max_dead_ratio
+
+    def compact_in_background(self, on_done=None):
+        """Start a compaction thread unless one is already running; `on_done` runs after it publishes."""
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_safely, args=(on_done,), name='model-compaction', daemon=True).start()
+
+    def _compact_safely(self, on_done):
+        try:
+            if self.compact() and on_done:
+                on_done()
+        except Exception as e:
+            logger.error(f"Model compaction failed: {str(e)}")
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        """Merge the current segments into one, without the deleted labels. Returns True if it did."""
+        with self._lock:
+            merged = list(self.manifest['segments'])
+            deleted = set(self.manifest['deleted_labels'])
+            version = self.manifest['version'] + 1
+            self.manifest['version'] = version  # reserve the segment name
+        if len(merged) < 2 and not deleted:
+            return False
+
+        # Merge outside the lock so enrollments can keep appending meanwhile
+        histograms, labels = [], []
+        for segment in merged:
+            segment_histograms, segment_labels = self._read_segment(segment, mmap_mode='r')
+            live = ~np.isin(segment_labels, list(deleted))
+            histograms.append(segment_histograms[live])
+            labels.append(segment_labels[live])
+        name = f"seg-{version:06d}"
+        self._write_segment(name, np.concatenate(histograms), np.concatenate(labels))
+
+        with self._lock:
+            manifest = self._next_manifest(self.manifest['version'] + 1)
+            # Segments appended during the merge stay after the merged one
+            manifest['segments'] = [name] + [s for s in manifest['segments'] if s not in merged]
+            manifest['deleted_labels'] = [label for label in manifest['deleted_labels'] if label not in deleted]
+            self._publish(manifest)
+        self._delete_segments(merged)
+        logger.info(f"Compacted {len(merged)} model segments into {name}")
+        return True
+
+    def _next_manifest(self, version):
+        manifest = json.loads(json.dumps(self.manifest))
+        manifest['version'] = version
+        return manifest
+
+    def _publish(self, manifest):
+        """Atomically replace the manifest: write a temp file, fsync, then rename over it."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        self.manifest = manifest
+
+    def _segment_paths(self, name):
+        return (
+            os.path.join(self.segment_dir, f"{name}.histograms.npy"),
+            os.path.join(self.segment_dir, f"{name}.labels.npy"),
+        )
+
+    def _write_segment(self, name, histograms, labels):
+        os.makedirs(self.segment_dir, exist_ok=True)
+        for path, array in zip(self._segment_paths(name), (histograms, labels)):
+            with open(path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read_segment(self, name, mmap_mode=None):
+        histograms_path, labels_path = self._segment_paths(name)
+        return np.load(histograms_path, mmap_mode=mmap_mode), np.load(labels_path, mmap_mode=mmap_mode)
+
+    def _delete_segments(self, names):
+        for name in names:
+            for path in self._segment_paths(name):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    # Still mapped by a process (Windows); removed as an orphan on next load
+                    logger.warning(f"Could not remove old segment {path}: {str(e)}")
+
+    def _remove_orphans(self):
+        """Delete segment files a crash left behind before they were published."""
+        if not os.path.isdir(self.segment_dir):
+            return
+        live = set(self.manifest['segments'])
+        for filename in os.listdir(self.segment_dir):
+            if filename.split('.')[0] not in live:
+                os.remove(os.path.join(self.segment_dir, filename))
@@ -1,34 +1,117 @@
-from flask import Blueprint, jsonify, request
-from firebase_admin import firestore
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+import authorization_analytics
+from auth_service import verify_token
+from storage import storage
 
-db = firestore.client()  # Firestore client
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp, doc_id):
+    """Opaque page token: the (timestamp, document id) of the last log returned."""
+    payload = json.dumps([timestamp.isoformat(), doc_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    timestamp, doc_id = json.loads(payload)
+    return datetime.fromisoformat(timestamp), doc_id
+
+
+def parse_time(value):
+    """ISO 8601 time (UTC if no offset is given)."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def serialize_log(log_data):
+    # log_data carries its document ID for frontend reference
+    if isinstance(log_data.get('timestamp'), datetime):
+        log_data['timestamp'] = log_data['timestamp'].isoformat()
+    return log_data
+
+
 @admin_bp.route('/authorization_logs', methods=['GET'])
+@verify_token
 def get_authorization_logs():
     """
-    Fetch all authorization logs or filter them based on query parameters.
+    Fetch one page of authorization logs, ordered by timestamp.
     Query params supported:
     - email (Filter by user_email)
     - authorized (Filter by authorized status)
+    - since / until (ISO 8601 time range, since inclusive, until exclusive)
+    - order ('desc' newest first, the default, or 'asc')
+    - limit (page size, default 100, at most 1000)
+    - cursor (nextCursor of the previous page)
+
+    The response is streamed as {"logs": [...], "nextCursor": token or null}.
+    With Firestore, filter combinations need the composite indexes in firestore.indexes.json.
     """
+    if request.user.get('role') != 'admin':
+        return jsonify({'message': 'Permission denied. Admin role required.'}), 403
     try:
-        logs_ref = db.collection('authorization_logs')
         query_params = request.args
+        cursor = query_params.get('cursor')
+        limit = max(1, min(int(query_params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        # One extra log tells whether there is a next page. The first one is
+        # fetched here so query errors (e.g. a missing index) still get a 500.
+        logs = storage.authorization_logs.page(
+            email=query_params.get('email'),
+            authorized=query_params['authorized'].lower() == 'true' if 'authorized' in query_params else None,
+            since=parse_time(query_params['since']) if 'since' in query_params else None,
+            until=parse_time(query_params['until']) if 'until' in query_params else None,
+            descending=query_params.get('order') != 'asc',
+            after=decode_cursor(cursor) if cursor else None,
+            limit=limit + 1
+        )
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': f"Invalid query parameter: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+    def generate():
+        yield '{"logs":['
+        last, count = None, 0
+        for log in logs:
+            if count == limit:
+                # More logs follow: hand out a cursor after the last one sent
+                yield '],"nextCursor":' + json.dumps(encode_cursor(last[0], last[1])) + '}'
+                return
+            last, count = (log.get('timestamp'), log['id']), count + 1
+            yield (',' if count > 1 else '') + json.dumps(serialize_log(log), default=str)
+        yield '],"nextCursor":null}'
 
-        # Apply filters based on query params
-        if 'email' in query_params:
-            logs_ref = logs_ref.where('user_email', '==', query_params['email'])
-        if 'authorized' in query_params:
-            authorized = query_params['authorized'].lower() == 'true'
-            logs_ref = logs_ref.where('authorized', '==', authorized)
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
-        logs = []
-        for doc in logs_ref.stream():
-            log_data = doc.to_dict()
-            log_data['id'] = doc.id  # Include document ID for frontend reference
-            logs.append(log_data)
 
-        return jsonify(logs), 200
+@admin_bp.route('/authorization_analytics', methods=['GET'])
+@verify_token
+def get_authorization_analytics():
+    """
+    Authorization counters maintained as decisions are logged.
+    Query params supported:
+    - since / until (ISO 8601, hourly buckets to return; default the last 24 hours)
+    - email (only this user's counters)
+    - limit (users with the most attempts to return, default 100)
+    """
+    if request.user.get('role') != 'admin':
+        return jsonify({'message': 'Permission denied. Admin role required.'}), 403
+    try:
+        query_params = request.args
+        until = parse_time(query_params['until']) if 'until' in query_params else datetime.now(timezone.utc)
+        since = parse_time(query_params['since']) if 'since' in query_params else until - timedelta(hours=24)
+        limit = max(1, min(int(query_params.get('limit', 100)), MAX_PAGE_SIZE))
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': f"Invalid query parameter: {str(e)}"}), 400
+
+    try:
+        summary = authorization_analytics.read_summary(storage.authorization_logs, since, until, query_params.get('email'), limit)
+        return jsonify(summary), 200
     except Exception as e:
-        return jsonify({'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,22 @@
+from flask import Blueprint, jsonify, request
+from auth_service import verify_token
+from training_jobs import training_jobs
+
+training_bp = Blueprint('training', __name__, url_prefix='/training')
+
+# Job fields returned to clients
+JOB_FIELDS = ('id', 'face_id', 'state', 'stage', 'progress', 'error', 'batch_size', 'created_at', 'started_at', 'finished_at')
+
+
+@training_bp.route('/jobs/<job_id>', methods=['GET'])
+@verify_token
+def get_training_job(job_id):
+    """State of an enrollment training job, for its requester or an admin."""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'message': 'Training job not found'}), 404
+
+    if request.user.get('role') != 'admin' and request.user.get('email') != job['requested_by']:
+        return jsonify({'message': 'Permission denied.'}), 403
+
+    return jsonify({field: job[field] for field in JOB_FIELDS}), 200
@@ -1,47 +1,29 @@
 from flask import Blueprint, request, jsonify,current_app
-from firebase_admin import auth
-from functools import wraps
 from datetime import datetime,timezone
-from firebase_service import db
-from firebase_admin.firestore import FieldFilter 
+from storage import storage
 import json
-from threading import Timer
+from socket_sessions import socket_sessions
+from auth_service import verify_token, invalidate_user, delete_account
+from user_directory import user_directory
+import face_model
+import config
+from access_expiry import access_expiry, has_secure_access
 
 
 users_bp = Blueprint('users', __name__)
 
-def verify_token(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'message': 'No token provided'}), 401
-        
-        token = auth_header.split('Bearer ')[1]
-        try:
-            decoded_token = auth.verify_id_token(token)
-            request.user = decoded_token
-            return f(*args, **kwargs)
-        except Exception as e:
-            return jsonify({'message': 'Invalid token'}), 401
-            
-    return decorated_function
-
 @users_bp.route('/user/me', methods=['GET'])
 @verify_token
 def get_current_user():
     # Extract user ID from the token
     user_id = request.user['uid']
 
-    # Retrieve the user's data from Firestore (replace with your actual Firestore query)
-    user_ref = db.collection('users').document(user_id)
-    user_data = user_ref.get()
+    # Retrieve the user's data from the in-memory users mirror
+    user_data = user_directory.by_id(user_id)
 
-    if not user_data.exists:
+    if user_data is None:
         return jsonify({"message": "User not found"}), 404
 
-    user_data = user_data.to_dict()
-
     return jsonify({
         "id": user_id,
         "email": user_data['email'],
@@ -49,7 +31,9 @@ def get_current_user():
         "photoURL": user_data.get('photoURL'),
         "isFaceTrained": user_data.get('isFaceTrained'),
         "isValidated": user_data.get('isValidated'),
-        "canAccessSecureRoute":user_data.get('canAccessSecureRoute'),
+        # An expired grant reads as revoked even before the scheduler clears it
+        "canAccessSecureRoute": has_secure_access(user_data),
+        "accessExpiresAt": user_data['accessExpiresAt'].isoformat() if user_data.get('accessExpiresAt') else None,
         "role":user_data.get('role')
     })
 
@@ -68,20 +52,20 @@ def update_current_user():
         if not email.lower().endswith('@gmail.com'):
             return jsonify({'message': 'Only Gmail addresses are allowed'}), 400
     
-    # Update the current user's profile in Firestore
-    user_ref = db.collection('users').document(user_id)
-    user_data = user_ref.get()
+    # Update the current user's profile
+    user_data = storage.users.get(user_id)
 
-    if not user_data.exists:
+    if user_data is None:
         return jsonify({"message": "User not found"}), 404
 
     # Update user fields based on the provided data
-    user_ref.update({
-        'name': data.get('name', user_data.get('name')),
-        'photoURL': data.get('photoURL', user_data.get('photoURL')),
-        'email': email or user_data.get('email'),
-        'updatedAt': datetime.now(timezone.utc)
-    })
+    with user_directory.writing(user_id, email=email):
+        storage.users.update(user_id, {
+            'name': data.get('name', user_data.get('name')),
+            'photoURL': data.get('photoURL', user_data.get('photoURL')),
+            'email': email or user_data.get('email'),
+            'updatedAt': datetime.now(timezone.utc)
+        })
 
     return jsonify({"message": "User profile updated successfully"})
 
@@ -91,13 +75,7 @@ def get_users():
     if request.user.get('role') != 'admin':
         return jsonify({'message': 'Permission denied. Admin role required.'}), 403
     try:
-        users_ref = db.collection('users').where(filter=FieldFilter("role", "==", 'user'))
-        users = []
-        for doc in users_ref.stream():
-            user_data = doc.to_dict()
-            user_data['id'] = doc.id
-            users.append(user_data)
-        return jsonify(users)
+        return jsonify(user_directory.list(role='user'))
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
@@ -117,12 +95,11 @@ def create_user():
             return jsonify({'message': 'Only Gmail addresses are allowed'}), 400
 
         # Check if a user with this email already exists in Firestore
-        existing_users = db.collection('users').where(filter=FieldFilter('email', '==', email)).get()
-        if existing_users:
+        if user_directory.by_email(email) is not None:
             return jsonify({'message': 'Email already exists'}), 400
 
         # Generate a unique ID for the user
-        user_id = db.collection('users').document().id
+        user_id = storage.users.new_id()
 
         # Prepare user data
         user_data = {
@@ -138,9 +115,12 @@ def create_user():
             'updatedAt': datetime.now(timezone.utc)   
         }
 
-        # Store user data in Firestore
-        user_ref = db.collection('users').document(user_id)
-        user_ref.set(user_data)
+        # Store user data
+        with user_directory.writing(user_id, email=email):
+            storage.users.create(user_id, user_data)
+
+        # Drop cached tokens of this email
+        invalidate_user(email=email)
 
         return jsonify({'message': 'User created successfully', 'user': user_data}), 201
     except Exception as e:
@@ -157,29 +137,32 @@ def delete_user(id):
         # Log the user ID received in the URL for debugging purposes
         current_app.logger.info(f"Attempting to delete user with Firestore document ID: {id}")
 
-        # Search Firestore for user by Firestore document ID
-        user_ref = db.collection('users').where(filter=FieldFilter('id', '==', id)).limit(1)
-        user_docs = user_ref.get()
+        # Look the user up by Firestore document ID
+        user_data = user_directory.by_id(id)
 
-        if not user_docs:
+        if user_data is None:
             return jsonify({'message': 'User not found in Firestore'}), 404
 
-        # Get Firestore user data and email
-        user_data = user_docs[0].to_dict()
         email = user_data.get('email')
 
         # Attempt to delete the user from Firebase Authentication
-        try:
-            firebase_user = auth.get_user(id)
-            # If the user exists in Firebase Authentication, delete them from Firebase
-            auth.delete_user(firebase_user.uid)
+        if delete_account(id):
             current_app.logger.info(f"User with UID {id} deleted from Firebase Authentication.")
-        except auth.UserNotFoundError:
+        else:
             # If the user does not exist in Firebase Authentication, log and continue
             current_app.logger.info(f"User with UID {id} not found in Firebase Authentication, skipping deletion.")
 
-        # Delete the user from Firestore
-        db.collection('users').document(user_docs[0].id).delete()
+        # Delete the user's document
+        with user_directory.writing(id, email=email):
+            storage.users.delete(id)
+
+        # Remove the user's face histograms from the recognition model
+        if face_model.remove_user(id):
+            current_app.logger.info(f"Removed face model of user {id}.")
+
+        # Close any open socket sessions so the deleted user can't keep streaming frames
+        socket_sessions.revoke(email=email, uid=id)
+        invalidate_user(email=email, uid=id)
         current_app.logger.info(f"User with Firestore document ID {id} and email {email} deleted successfully.")
 
         return jsonify({'message': f'User {email} deleted successfully'}), 200
@@ -192,20 +175,14 @@ def delete_user(id):
 @verify_token
 def set_secure_access(user_id):
     try:
-        # Reference to the user document
-        user_ref = db.collection('users').document(user_id)
-
-        # Update `canAccessSecureRoute` to True
-        user_ref.update({"canAccessSecureRoute": True})
-
-        # Function to reset `canAccessSecureRoute` to False
-        def reset_access():
-            user_ref.update({"canAccessSecureRoute": False})
-
-        # Schedule the reset after 30 seconds
-        Timer(30.0, reset_access).start()
-
-        return jsonify({"message": f"Access granted for user {user_id} for 30 seconds"}), 200
+        # Set `canAccessSecureRoute` with its expiry; the expiry scheduler resets it
+        with user_directory.writing(user_id):
+            expires_at = access_expiry.grant(user_id, config.SECURE_ACCESS_SECONDS)
+
+        return jsonify({
+            "message": f"Access granted for user {user_id} for {config.SECURE_ACCESS_SECONDS:g} seconds",
+            "accessExpiresAt": expires_at.isoformat()
+        }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,79 @@
+"""One-time backfill of the authorization analytics counters from existing logs.
+
+Usage: python backfill_analytics.py --until <ISO 8601 time> [--dry-run]
+
+The server increments the counters for every decision it logs. Run this once
+after deploying that version, with --until set to when it started, so every
+older log is counted exactly once: logs before --until are read in pages
+ordered by timestamp, aggregated in memory, and added to the counter
+documents with one increment write per document.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVER_DIR)
+os.chdir(SERVER_DIR)
+from firebase_service import db
+from firebase_admin.firestore import FieldFilter
+import authorization_analytics
+
+PAGE_SIZE = 1000
+BATCH_WRITES = 400
+
+
+def logged_decisions(until):
+    """(user_email, authorized, confidence, timestamp) of every log before `until`, one page at a time."""
+    query = (
+        db.collection('authorization_logs')
+        .where(filter=FieldFilter('timestamp', '<', until))
+        .order_by('timestamp')
+        .order_by('__name__')
+        .limit(PAGE_SIZE)
+    )
+    last = None
+    while True:
+        page = list((query.start_after(last) if last else query).stream())
+        for doc in page:
+            log = doc.to_dict()
+            yield log.get('user_email', 'unknown'), bool(log.get('authorized')), log.get('confidence') or 0, log['timestamp']
+        if len(page) < PAGE_SIZE:
+            return
+        last = page[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--until', required=True, help="ISO 8601 time the counting server was started")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    until = datetime.fromisoformat(args.until.replace('Z', '+00:00'))
+    until = until if until.tzinfo else until.replace(tzinfo=timezone.utc)
+
+    start = time.perf_counter()
+    logs = 0
+
+    def counted(decisions):
+        nonlocal logs
+        for decision in decisions:
+            logs += 1
+            yield decision
+
+    updates = authorization_analytics.backfill_updates(counted(logged_decisions(until)))
+    print(f"Aggregated {logs} logs into {len(updates)} counter documents in {time.perf_counter() - start:.1f} s")
+    if args.dry_run:
+        return
+
+    for i in range(0, len(updates), BATCH_WRITES):
+        batch = db.batch()
+        for collection, doc_id, fields in updates[i:i + BATCH_WRITES]:
+            batch.set(db.collection(collection).document(doc_id), fields, merge=True)
+        batch.commit()
+    print(f"Wrote {len(updates)} documents in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Time-to-decision of the fixed 5 s client window vs. the server's K-of-N early exit.
+
+Usage: python bench_authorization.py [pass_rate ...]
+
+Simulates recognition attempts with the recognize page's timing: a frame
+every CAPTURE_INTERVAL ms, answered after SERVER_LATENCY ms, with each frame
+passing (one face of the user above the confidence threshold) with the given
+probability. Frames are fed to AuthorizationAttempts with the configured
+window. The fixed-window flow always decides at RECOGNITION_DURATION plus a
+round trip, whatever the frames showed.
+"""
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import config
+from authorization_window import AuthorizationAttempts
+
+CAPTURE_INTERVAL = 500
+RECOGNITION_DURATION = 5000
+SERVER_LATENCY = 60
+ROUND_TRIP = 40
+ATTEMPTS = 2000
+
+PASSING = [{'name': 'user', 'name_match': True, 'confidence': 60.0}]
+FAILING = [{'name': 'Unknown', 'name_match': False, 'confidence': 10.0}]
+
+
+def simulate(pass_rate, rng):
+    attempts = AuthorizationAttempts(
+        window=config.AUTH_WINDOW_FRAMES,
+        required=config.AUTH_REQUIRED_FRAMES,
+        min_confidence=config.AUTH_MIN_CONFIDENCE,
+        timeout=float('inf')
+    )
+    times, authorized = [], 0
+    frames_per_attempt = RECOGNITION_DURATION // CAPTURE_INTERVAL
+    for n in range(ATTEMPTS):
+        attempt_id = str(n)
+        attempts.accept_frame('sid', attempt_id, 'user', None)
+        decision = None
+        for frame in range(1, frames_per_attempt + 1):
+            faces = PASSING if rng.random() < pass_rate else FAILING
+            decision = attempts.record('sid', attempt_id, faces)
+            if decision:
+                times.append(frame * CAPTURE_INTERVAL + SERVER_LATENCY)
+                break
+        if decision is None:
+            decision = attempts.finish('sid', attempt_id)
+            times.append(RECOGNITION_DURATION + ROUND_TRIP)
+        authorized += decision['authorized']
+    return np.array(times), authorized / ATTEMPTS
+
+
+def main():
+    pass_rates = [float(rate) for rate in sys.argv[1:]] or [0.95, 0.8, 0.6, 0.3, 0.0]
+    rng = np.random.default_rng(0)
+    print(f"K-of-N: {config.AUTH_REQUIRED_FRAMES} of {config.AUTH_WINDOW_FRAMES}, "
+          f"frame every {CAPTURE_INTERVAL} ms; fixed window: {RECOGNITION_DURATION + ROUND_TRIP} ms")
+    print(f"{'pass rate':>10}{'authorized':>12}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}{'vs fixed':>10}")
+    for rate in pass_rates:
+        times, authorized = simulate(rate, rng)
+        p50, p95 = np.percentile(times, [50, 95])
+        saved = 1 - times.mean() / (RECOGNITION_DURATION + ROUND_TRIP)
+        print(f"{rate:>10.2f}{100 * authorized:>11.1f}%{p50:>9.0f}{p95:>9.0f}{times.mean():>9.0f}{-100 * saved:>9.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Full-dataset load time: per-frame image folders vs. packed per-user archives.
+
+Usage: python bench_dataset_load.py [users] [crops_per_user]
+
+Writes a synthetic dataset in a temporary directory in both formats (a folder
+of 200x200 PNG crops per user, and one dataset/<face_id>.npz per user, plain
+and zlib-compressed), then
+times reading every user's crops back with face_dataset.iter_samples(), as a
+full retrain or audit does. The page cache is dropped between runs when
+possible (needs root); otherwise the second format read benefits from it too.
+"""
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import face_dataset
+
+
+def synthetic_crops(rng, count):
+    # Smooth faces-like images compress like real crops; pure noise would not
+    base = cv2.GaussianBlur(rng.integers(0, 256, (200, 200), np.uint8), (0, 0), 6)
+    noise = rng.integers(0, 12, (count, 200, 200), np.uint8)
+    return cv2.equalizeHist(base)[None] // 2 + noise
+
+
+def drop_caches():
+    try:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def timed_load():
+    start = time.perf_counter()
+    users = crops = 0
+    for _, samples in face_dataset.iter_samples():
+        users += 1
+        crops += len(samples)
+    return users, crops, time.perf_counter() - start
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {}
+        for layout in ('folders', 'archives', 'compressed'):
+            face_dataset.DATASET_DIR = os.path.join(workdir, layout)
+            os.makedirs(face_dataset.DATASET_DIR)
+            write_start = time.perf_counter()
+            for user in range(users):
+                face_id = f"user{user:05d}"
+                crops = synthetic_crops(rng, per_user)
+                if layout != 'folders':
+                    face_dataset.save_samples(face_id, crops, compress=layout == 'compressed')
+                else:
+                    folder = face_dataset.user_folder(face_id)
+                    os.makedirs(folder)
+                    for i, crop in enumerate(crops, start=1):
+                        cv2.imwrite(os.path.join(folder, f"{face_id}.{i}.png"), crop)
+            write_seconds = time.perf_counter() - write_start
+
+            files = sum(len(files) for _, _, files in os.walk(face_dataset.DATASET_DIR))
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(face_dataset.DATASET_DIR) for name in names)
+            cold = drop_caches()
+            loaded_users, loaded_crops, load_seconds = timed_load()
+            results[layout] = (files, size, write_seconds, load_seconds, loaded_crops, cold)
+
+    print(f"{users} users x {per_user} crops")
+    print(f"{'format':<12}{'files':>9}{'MB':>9}{'write s':>9}{'load s':>9}{'crops/s':>10}  cache")
+    for layout, (files, size, write_seconds, load_seconds, crops, cold) in results.items():
+        print(f"{layout:<12}{files:>9}{size / 2**20:>9.1f}{write_seconds:>9.1f}{load_seconds:>9.2f}"
+              f"{crops / load_seconds:>10.0f}  {'cold' if cold else 'warm'}")
+
+
+if __name__ == '__main__':
+    main()
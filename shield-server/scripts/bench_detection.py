@@ -0,0 +1,139 @@
+"""Per-frame detection latency vs. recall for each decode mode / detection scale.
+
+Usage: python bench_detection.py <video file | directory of images | synthetic> [max_frames]
+
+Use a contiguous webcam recording (e.g. 640x480) to measure face tracking:
+tracked configurations only rescan the full frame when the face is lost or
+every TRACKER_RESCAN_INTERVAL frames. `synthetic` generates a repeatable
+640x480 stream of a drawn face drifting over a noisy background, for when no
+recording is at hand.
+
+Frames are JPEG-encoded at quality 80 (as the browser sends them). The
+full-resolution color pipeline is the reference: recall is the share of its
+boxes that each configuration also finds (IoU >= 0.5).
+"""
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVER_DIR)
+from frame_pipeline import Frame
+from face_tracker import FaceTracker, tracking_stats
+
+# (decode mode, detection scale, face tracking)
+CONFIGS = [
+    ('color', 1, False), ('gray', 1, False), ('gray', 2, False), ('gray', 4, False), ('gray', 8, False),
+    ('gray', 1, True), ('gray', 2, True),
+]
+
+
+def synthetic_face(size):
+    """A blurred frontal face drawing the Haar cascade detects: skin oval, brows, eyes, nose, mouth."""
+    face = np.zeros((size, size), np.uint8)
+    c = size // 2
+    axes = lambda w, h: (int(size * w), int(size * h))
+    cv2.ellipse(face, (c, c + 5), axes(0.36, 0.46), 0, 0, 360, 190, -1)
+    for side in (-1, 1):
+        x = c + side * int(size * 0.16)
+        cv2.ellipse(face, (x, int(c - size * 0.14)), axes(0.11, 0.025), 0, 0, 360, 70, -1)
+        cv2.ellipse(face, (x, int(c - size * 0.06)), axes(0.08, 0.04), 0, 0, 360, 40, -1)
+    cv2.line(face, (c, int(c - size * 0.05)), (c, int(c + size * 0.12)), 150, int(size * 0.03))
+    cv2.ellipse(face, (c, int(c + size * 0.12)), axes(0.07, 0.025), 0, 0, 360, 110, -1)
+    cv2.ellipse(face, (c, int(c + size * 0.25)), axes(0.13, 0.035), 0, 0, 360, 80, -1)
+    return cv2.GaussianBlur(face, (0, 0), size / 80)
+
+
+def synthetic_frames(count, size=220):
+    rng = np.random.default_rng(1)
+    background = cv2.GaussianBlur(rng.integers(60, 140, (480, 640)).astype(np.uint8), (0, 0), 8)
+    face = synthetic_face(size)
+    mask = face > 20
+    frames = []
+    for i in range(count):
+        # Slow drift, like a user in front of a webcam
+        x, y = 200 + int(60 * np.sin(i / 15)), 120 + int(20 * np.cos(i / 20))
+        img = background.copy()
+        img[y:y + size, x:x + size][mask] = face[mask]
+        img = np.clip(img + rng.normal(0, 4, img.shape), 0, 255).astype(np.uint8)
+        frames.append(cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))
+    return frames
+
+
+def load_frames(source, max_frames):
+    frames = []
+    if source == 'synthetic':
+        frames = synthetic_frames(max_frames)
+    elif os.path.isdir(source):
+        for name in sorted(os.listdir(source))[:max_frames]:
+            img = cv2.imread(os.path.join(source, name), cv2.IMREAD_COLOR)
+            if img is not None:
+                frames.append(img)
+    else:
+        capture = cv2.VideoCapture(source)
+        while len(frames) < max_frames:
+            ok, img = capture.read()
+            if not ok:
+                break
+            frames.append(img)
+    return [cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes() for img in frames]
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def run(jpegs, detector, mode, scale, tracked=False):
+    tracker = FaceTracker() if tracked else None
+    boxes, start = [], time.perf_counter()
+    for jpeg in jpegs:
+        frame = Frame(jpeg, mode=mode, scale=scale)
+        faces = frame.detect_faces(detector, scaleFactor=1.1, minNeighbors=5, min_size=(120, 120), tracker=tracker)
+        if faces:
+            frame.gray()  # the full-resolution decode needed for the crops
+        boxes.append(faces)
+    return boxes, 1000 * (time.perf_counter() - start) / len(jpegs)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    max_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    jpegs = load_frames(sys.argv[1], max_frames)
+    if not jpegs:
+        print("No frames found")
+        sys.exit(1)
+
+    detector = cv2.CascadeClassifier(os.path.join(SERVER_DIR, 'haarcascade_frontalface_default.xml'))
+    reference, _ = run(jpegs, detector, 'color', 1)
+    total = sum(len(faces) for faces in reference)
+
+    print(f"{len(jpegs)} frames, {total} reference faces")
+    print(f"{'mode':<6} {'scale':>5} {'tracked':>7} {'ms/frame':>9} {'recall':>7}")
+    for mode, scale, tracked in CONFIGS:
+        before = tracking_stats.snapshot()
+        boxes, ms = run(jpegs, detector, mode, scale, tracked)
+        found = sum(
+            any(iou(ref, box) >= 0.5 for box in frame_boxes)
+            for ref_boxes, frame_boxes in zip(reference, boxes)
+            for ref in ref_boxes
+        )
+        recall = found / total if total else float('nan')
+        line = f"{mode:<6} {scale:>5} {str(tracked):>7} {ms:>9.2f} {recall:>7.3f}"
+        if tracked:
+            after = tracking_stats.snapshot()
+            full, roi = (after[f'{kind}s'] - before[f'{kind}s'] for kind in ('full_scan', 'roi_scan'))
+            line += f"   {full} full scans, {roi} ROI searches"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Per-frame write latency and total enrollment time: JPEG per frame vs. in-memory buffer.
+
+Usage: python bench_enrollment.py [directory of face images] [frames]
+
+legacy:   every accepted frame lists the user's folder and writes a JPEG;
+          training reads the files back, re-detects and resizes each crop.
+buffered: every frame appends its normalized crop to the capture buffer;
+          training uses the buffer and the dataset is written in one pass.
+
+Without a directory, random 240x240 crops are used. The cascade finds no
+faces in them, so the legacy training time then excludes the histograms and
+understates the difference; pass real face crops (e.g. an existing
+dataset/<face_id> folder) for representative numbers.
+"""
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVER_DIR)
+from capture_buffer import CaptureBuffers
+from frame_pipeline import normalize_face
+from lbph import spatial_histogram
+import face_dataset
+
+
+def load_crops(source, frames):
+    if source is None:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, (240, 240), np.uint8) for _ in range(frames)]
+    crops = []
+    for name in sorted(os.listdir(source)):
+        img = cv2.imread(os.path.join(source, name), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            crops.append(img)
+    return [crops[i % len(crops)] for i in range(frames)]
+
+
+def bench_legacy(crops, detector):
+    folder = os.path.join(face_dataset.DATASET_DIR, 'legacy')
+    os.makedirs(folder)
+    frame_seconds = []
+    start = time.perf_counter()
+    for crop in crops:
+        frame_start = time.perf_counter()
+        existing_images = len(os.listdir(folder))
+        cv2.imwrite(f"{folder}/legacy.{existing_images + 1}.jpg", cv2.equalizeHist(crop))
+        frame_seconds.append(time.perf_counter() - frame_start)
+
+    train_start = time.perf_counter()
+    try:
+        samples = face_dataset.load_samples('legacy', detector)
+    except ValueError:
+        samples = []
+    for sample in samples:
+        spatial_histogram(sample)
+    train_seconds = time.perf_counter() - train_start
+    return frame_seconds, train_seconds, 0.0, time.perf_counter() - start
+
+
+def bench_buffered(crops):
+    buffers = CaptureBuffers(capacity=len(crops))
+    frame_seconds = []
+    start = time.perf_counter()
+    for crop in crops:
+        frame_start = time.perf_counter()
+        buffers.add('sid', 'buffered', normalize_face(crop))
+        frame_seconds.append(time.perf_counter() - frame_start)
+
+    train_start = time.perf_counter()
+    samples = buffers.take('sid')
+    for sample in samples:
+        spatial_histogram(sample)
+    train_seconds = time.perf_counter() - train_start
+    write_seconds = face_dataset.save_samples('buffered', samples)
+    return frame_seconds, train_seconds, write_seconds, time.perf_counter() - start
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    crops = load_crops(source and os.path.abspath(source), frames)
+    detector = cv2.CascadeClassifier(os.path.join(SERVER_DIR, 'haarcascade_frontalface_default.xml'))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        results = {'legacy': bench_legacy(crops, detector), 'buffered': bench_buffered(crops)}
+
+    print(f"{frames} frames")
+    print(f"{'path':<10}{'frame p50 ms':>14}{'frame p95 ms':>14}{'train ms':>10}{'write ms':>10}{'total ms':>10}")
+    for name, (frame_seconds, train_seconds, write_seconds, total_seconds) in results.items():
+        p50, p95 = np.percentile(frame_seconds, [50, 95]) * 1000
+        print(f"{name:<10}{p50:>14.3f}{p95:>14.3f}{1000 * train_seconds:>10.1f}"
+              f"{1000 * write_seconds:>10.1f}{1000 * total_seconds:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Frames consumed and training time of an enrollment capture, with and without the quality gate.
+
+Usage: python bench_enrollment_gate.py [video file | directory of images]
+
+Frames are run through detection and cropping like enrollment does; the
+first ENROLL_FRAMES x 3 are used. Without a source, a synthetic capture is
+generated: a face-like texture drifting slowly, with stretches where the
+user holds still (near-duplicates) and some motion-blurred frames.
+
+For each run it prints the frames the client had to send, the frames kept,
+rejections by reason, and the time to compute the training histograms.
+"""
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVER_DIR)
+import config
+import frame_quality
+from capture_buffer import CaptureBuffers
+from frame_pipeline import FACE_SIZE, Frame, normalize_face
+from frame_quality import QualityGate
+from lbph import spatial_histogram
+
+
+def source_crops(source, max_frames):
+    detector = cv2.CascadeClassifier(os.path.join(SERVER_DIR, 'haarcascade_frontalface_default.xml'))
+    if os.path.isdir(source):
+        images = (cv2.imread(os.path.join(source, name)) for name in sorted(os.listdir(source)))
+    else:
+        capture = cv2.VideoCapture(source)
+        images = iter(lambda: capture.read()[1], None)
+
+    crops = []
+    for img in images:
+        if img is None:
+            continue
+        if len(crops) >= max_frames:
+            break
+        frame = Frame(cv2.imencode('.jpg', img)[1].tobytes(), mode='gray', scale=config.ENROLL_DETECTION_SCALE)
+        faces = frame.detect_faces(detector, scaleFactor=1.1, minNeighbors=5, min_size=(120, 120))
+        if len(faces) == 1:
+            x, y, w, h = faces[0]
+            crops.append(cv2.resize(frame.gray()[y:y+h, x:x+w], FACE_SIZE))
+    return crops
+
+
+def synthetic_crops(count):
+    rng = np.random.default_rng(0)
+    texture = cv2.GaussianBlur(rng.integers(0, 256, (400, 400), np.uint8), (0, 0), 1.2)
+    crops, x, y = [], 100.0, 100.0
+    for i in range(count):
+        # Hold still for a while every 20 frames, otherwise drift
+        if i % 20 >= 8:
+            x += rng.normal(0, 6)
+            y += rng.normal(0, 6)
+            x, y = float(np.clip(x, 0, 200)), float(np.clip(y, 0, 200))
+        crop = texture[int(y):int(y) + 200, int(x):int(x) + 200].copy()
+        crop = cv2.add(crop, rng.integers(0, 3, crop.shape, np.uint8))
+        if rng.random() < 0.15:
+            crop = cv2.blur(crop, (9, 9))
+        crops.append(crop)
+    return crops
+
+
+def run(crops, gate):
+    buffers = CaptureBuffers(capacity=config.ENROLL_FRAMES, gate=gate)
+    sent, rejected = 0, {}
+    for crop in crops:
+        sent += 1
+        _, reason, complete = buffers.add('sid', 'user', normalize_face(crop), frame_quality.measure(crop))
+        if reason:
+            rejected[reason] = rejected.get(reason, 0) + 1
+        if complete:
+            break
+    samples = buffers.take('sid')
+    samples = [] if samples is None else samples
+    start = time.perf_counter()
+    for sample in samples:
+        spatial_histogram(sample)
+    return sent, len(samples), rejected, time.perf_counter() - start
+
+
+def main():
+    max_frames = config.ENROLL_FRAMES * 3
+    crops = source_crops(sys.argv[1], max_frames) if len(sys.argv) > 1 else synthetic_crops(max_frames)
+    gate = QualityGate(
+        min_sharpness=config.ENROLL_MIN_SHARPNESS,
+        brightness_range=(config.ENROLL_MIN_BRIGHTNESS, config.ENROLL_MAX_BRIGHTNESS),
+        duplicate_distance=config.ENROLL_DUPLICATE_DISTANCE,
+        diverse_distance=config.ENROLL_DIVERSE_DISTANCE,
+        diversity_target=config.ENROLL_DIVERSITY_TARGET,
+        min_frames=config.ENROLL_MIN_FRAMES
+    )
+
+    print(f"{len(crops)} frames with one face available")
+    for name, run_gate in (('ungated', None), ('gated', gate)):
+        sent, kept, rejected, train_seconds = run(crops, run_gate)
+        print(f"{name:<8} sent {sent:>4}  kept {kept:>4}  train {1000 * train_seconds:7.1f} ms  rejected {rejected}")
+
+
+if __name__ == '__main__':
+    main()
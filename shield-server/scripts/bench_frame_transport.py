@@ -0,0 +1,50 @@
+"""Compare bytes/frame and decode time of binary frames vs base64 data URLs.
+
+Usage: python bench_frame_transport.py [image.jpg] [iterations]
+Without an image a synthetic 640x480 frame is encoded at JPEG quality 80,
+matching what the browser sends.
+"""
+import base64
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from frame_pipeline import Frame
+
+
+def synthetic_frame(width=640, height=480):
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:height, 0:width]
+    img = np.stack([(xx * 255 / width), (yy * 255 / height), ((xx + yy) * 127 / (width + height))], axis=-1)
+    img += rng.normal(0, 8, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def bench(payload, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        Frame(payload, mode='color').gray()
+    return 1000 * (time.perf_counter() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            jpeg = f.read()
+    else:
+        jpeg = cv2.imencode('.jpg', synthetic_frame(), [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+
+    print(f"{'transport':<10} {'bytes/frame':>12} {'decode ms':>10}")
+    print(f"{'binary':<10} {len(jpeg):>12} {bench(jpeg, iterations):>10.3f}")
+    print(f"{'data_url':<10} {len(data_url):>12} {bench(data_url, iterations):>10.3f}")
+    print(f"wire overhead of data URLs: {100 * (len(data_url) / len(jpeg) - 1):.1f}%")
+
+
+if __name__ == '__main__':
+    main()
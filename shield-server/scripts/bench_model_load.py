@@ -0,0 +1,64 @@
+"""Cold-start time of the legacy trainer.yml vs. the memory-mapped segment store.
+
+Usage: python bench_model_load.py [users] [samples_per_user]
+
+Trains an OpenCV LBPH model on synthetic faces, saves it as YAML and as a
+segment store in a temporary directory, then times:
+- recognizer.read() of the YAML file (what startup used to do)
+- ModelStore.load() + HistogramStore.from_segments() (memory-mapped)
+- the first 1:1 verification on the mapped store, which faults in only
+  that user's pages
+Run it a second time to see the warm page-cache numbers.
+"""
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from lbph import HistogramStore, spatial_histogram
+from model_store import ModelStore
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, 1000 * (time.perf_counter() - start)
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rng = np.random.default_rng(0)
+
+    faces = [rng.integers(0, 256, (200, 200), dtype=np.uint8) for _ in range(users * samples)]
+    labels = np.repeat(np.arange(users, dtype=np.int32), samples)
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(faces, labels)
+    histograms = np.asarray(recognizer.getHistograms(), np.float32).reshape(len(faces), -1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        yaml_path = os.path.join(directory, 'trainer.yml')
+        recognizer.save(yaml_path)
+        model_store = ModelStore(directory)
+        model_store.save_all(histograms, labels, {str(label): f"user-{label}" for label in range(users)})
+
+        print(f"{users} users x {samples} samples = {len(faces)} histograms")
+        print(f"trainer.yml: {os.path.getsize(yaml_path) / 2**20:.1f} MB, "
+              f"segments: {histograms.nbytes / 2**20:.1f} MB")
+
+        _, yaml_ms = timed(lambda: cv2.face.LBPHFaceRecognizer_create().read(yaml_path))
+        print(f"YAML load:             {yaml_ms:>9.1f} ms")
+
+        store, mmap_ms = timed(lambda: HistogramStore.from_segments(ModelStore(directory).load()[0]))
+        print(f"mmap load:             {mmap_ms:>9.1f} ms")
+
+        probe = spatial_histogram(faces[0])
+        _, verify_ms = timed(lambda: store.verify(probe, 0))
+        print(f"first 1:1 verify:      {verify_ms:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Throughput of the storage-bound request paths, with and without simulated Firestore round trips.
+
+Usage: python bench_storage.py [latency_ms ...] [--users N] [--threads N] [--ops N]
+
+Runs the server's own storage code against the in-memory backend, for each
+simulated round-trip time, from `--threads` concurrent callers (like request
+handler threads):
+
+  lookup      user lookup by email: direct repository query vs. the users mirror
+  login       verify_user's writes for an unchanged returning user
+  decision    logging an authorization decision and its analytics counters:
+              synchronous batch commit vs. the background audit writer
+  logs page   one 100-log page of the admin logs endpoint
+
+No Firestore project or credentials are needed.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# The module-level storage the server code imports must not open Firestore
+os.environ['STORAGE_BACKEND'] = 'memory'
+from storage import create_storage
+from user_directory import UserDirectory
+from audit_writer import AuditWriter
+import authorization_analytics
+import user_logins
+
+
+def seed(storage, users):
+    """`users` validated users keyed by uid, and a day of authorization logs for them."""
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    writes = []
+    for n in range(users):
+        uid = f"uid{n:06d}"
+        writes.append(('users', uid, {
+            'id': uid, 'uid': uid, 'email': f"user{n}@gmail.com", 'role': 'user',
+            'name': f"User {n}", 'photoURL': '', 'isValidated': True, 'isFaceTrained': True,
+        }, False))
+        for attempt in range(5):
+            writes.append(('authorization_logs', None, {
+                'user_email': f"user{n}@gmail.com", 'recognized_as': uid, 'confidence': 60.0,
+                'authorized': attempt % 4 != 0, 'ip_address': '127.0.0.1',
+                'timestamp': start + timedelta(seconds=17 * (5 * n + attempt)),
+            }, False))
+    storage.store.commit(writes)
+
+
+def run(operation, threads, ops):
+    """Run `operation(i)` ops times from `threads` threads; return ops/s and per-op latencies (ms)."""
+    def timed(i):
+        start = time.perf_counter()
+        operation(i)
+        return 1000 * (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = np.array(list(pool.map(timed, range(ops))))
+    return ops / (time.perf_counter() - start), latencies
+
+
+def bench(latency_ms, args):
+    storage = create_storage('memory', latency_ms=latency_ms, jitter_ms=latency_ms / 4)
+    seed(storage, args.users)
+    directory = UserDirectory()
+    directory.start(storage.users)
+    # Large enough that no decision is dropped; how long it takes to drain is reported after the run
+    writer = AuditWriter(max_queue=10 * args.ops, batch_size=200, flush_interval=0.05)
+    writer.start(storage)
+    email = lambda i: f"user{i % args.users}@gmail.com"
+
+    def log_decision(target, i):
+        target.add('authorization_logs', {
+            'user_email': email(i), 'recognized_as': 'x', 'confidence': 55.0, 'authorized': True,
+            'ip_address': '127.0.0.1', 'timestamp': datetime.now(timezone.utc),
+        })
+        authorization_analytics.record_decision(target, email(i), True, 55.0)
+
+    class Collector:
+        """Collects a decision's writes, to commit them before returning as before the audit writer."""
+        def __init__(self):
+            self.writes = []
+
+        def add(self, collection, data):
+            self.writes.append((collection, None, data, False))
+
+        def set(self, collection, doc_id, data, merge=True):
+            self.writes.append((collection, doc_id, data, merge))
+
+    def sync_decision(i):
+        collector = Collector()
+        log_decision(collector, i)
+        storage.write_batch(collector.writes)
+
+    def login(i):
+        user = directory.by_uid(f"uid{i % args.users:06d}")
+        token = {'uid': user['id'], 'email': user['email'], 'name': user['name'], 'picture': user['photoURL']}
+        user_logins.record_login(storage.users, user, token)
+
+    cases = [
+        ('lookup: repository', lambda i: storage.users.find_by_email(email(i))),
+        ('lookup: mirror', lambda i: directory.by_email(email(i))),
+        ('login: unchanged user', login),
+        ('decision: sync commit', sync_decision),
+        ('decision: audit writer', lambda i: log_decision(writer, i)),
+        ('logs page (100)', lambda i: list(storage.authorization_logs.page(limit=101))),
+    ]
+    for name, operation in cases:
+        before = storage.stats()['round_trips']
+        throughput, latencies = run(operation, args.threads, args.ops)
+        trips = (storage.stats()['round_trips'] - before) / args.ops
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"{latency_ms:>6g} {name:<24}{throughput:>10.0f}{p50:>9.2f}{p95:>9.2f}{trips:>8.2f}")
+    start = time.perf_counter()
+    writer.close()
+    stats = writer.stats()
+    print(f"{'':>7}audit writer drained {1000 * (time.perf_counter() - start):.0f} ms after the run: "
+          f"{stats['written']} writes in {stats['batches']} batches, {stats['dropped_queue_full']} dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('latencies', nargs='*', type=float, default=[0, 5, 20])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=400)
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.threads} threads")
+    print(f"{'RTT ms':>6} {'path':<24}{'ops/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'RTs/op':>8}")
+    for latency_ms in args.latencies:
+        bench(latency_ms, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Latency of 1:N identification vs. 1:1 verification by enrolled population.
+
+Usage: python bench_verification.py [samples_per_user] [probes]
+
+Enrolls synthetic 200x200 faces for 10, 100 and 1,000 users and times
+OpenCV's `recognizer.predict` (1:N), the HistogramStore's vectorized 1:N
+`match`, and 1:1 `verify` against the claimed user's histograms only.
+Each LBPH histogram is 64 KB, so 1,000 users x 10 samples needs ~650 MB
+of memory per model.
+"""
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from lbph import HistogramStore, spatial_histogram
+
+POPULATIONS = [10, 100, 1000]
+
+
+def synthetic_faces(users, samples, rng):
+    base = rng.integers(0, 256, (users, 200, 200), dtype=np.uint8)
+    faces, labels = [], []
+    for label in range(users):
+        for _ in range(samples):
+            noise = rng.integers(-10, 11, (200, 200))
+            faces.append(np.clip(base[label] + noise, 0, 255).astype(np.uint8))
+            labels.append(label)
+    return faces, np.array(labels)
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    probes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = np.random.default_rng(0)
+
+    print(f"{'users':>6} {'cv2 1:N ms':>11} {'store 1:N ms':>13} {'1:1 ms':>9}")
+    for users in POPULATIONS:
+        faces, labels = synthetic_faces(users, samples, rng)
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.train(faces, labels)
+
+        store = HistogramStore()
+        histograms = np.stack([spatial_histogram(face) for face in faces])
+        for label in range(users):
+            store.add(label, histograms[labels == label])
+
+        picks = rng.integers(0, len(faces), probes)
+
+        start = time.perf_counter()
+        for i in picks:
+            recognizer.predict(faces[i])
+        cv2_ms = 1000 * (time.perf_counter() - start) / probes
+
+        start = time.perf_counter()
+        for i in picks:
+            store.match(spatial_histogram(faces[i]))
+        identify_ms = 1000 * (time.perf_counter() - start) / probes
+
+        start = time.perf_counter()
+        for i in picks:
+            store.verify(spatial_histogram(faces[i]), int(labels[i]))
+        verify_ms = 1000 * (time.perf_counter() - start) / probes
+
+        print(f"{users:>6} {cv2_ms:>11.2f} {identify_ms:>13.2f} {verify_ms:>9.2f}")
+
+if __name__ == '__main__':
+    main()
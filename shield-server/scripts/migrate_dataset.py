@@ -0,0 +1,43 @@
+"""Pack every per-frame dataset/<face_id>/ folder into a dataset/<face_id>.npz archive.
+
+Usage: python migrate_dataset.py [--keep]
+
+Normalized PNG crops are packed as-is; older padded JPEG crops are re-detected
+and resized like training used to do. Folders are removed once their archive
+is written, or renamed to <face_id>.migrated with --keep. Safe to re-run:
+users that already have an archive are skipped.
+"""
+import os
+import sys
+import time
+import cv2
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVER_DIR)
+import face_dataset
+
+
+def main():
+    keep = '--keep' in sys.argv[1:]
+    os.chdir(SERVER_DIR)
+    detector = cv2.CascadeClassifier(os.path.join(SERVER_DIR, 'haarcascade_frontalface_default.xml'))
+
+    migrated = skipped = failed = crops = 0
+    start = time.perf_counter()
+    for face_id in face_dataset.face_ids():
+        if os.path.exists(face_dataset.archive_path(face_id)):
+            skipped += 1
+            continue
+        try:
+            crops += face_dataset.migrate_folder(face_id, detector, keep=keep)
+            migrated += 1
+        except Exception as e:
+            print(f"{face_id}: {str(e)}")
+            failed += 1
+
+    print(f"Migrated {migrated} users ({crops} crops), skipped {skipped}, failed {failed} "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
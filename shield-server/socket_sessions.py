@@ -0,0 +1,69 @@
+import threading
+import time
+import auth_service
+
+
+class SocketSessions:
+    """Identity of each authenticated Socket.IO connection, keyed by `request.sid`.
+
+    The token is verified (with a revocation check) and the user's role is looked
+    up once on `connect`. Events afterwards only read the stored identity, until
+    the token's `exp` passes or the session is revoked.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.stats = {'verifications': 0, 'session_hits': 0, 'expired': 0, 'revoked': 0}
+
+    def open(self, sid, token):
+        """Verify the token and store the identity for this connection, or return None."""
+        self.stats['verifications'] += 1
+        decoded_token = auth_service.verify_id_token(token, check_revoked=True)
+
+        user = auth_service.lookup_user(decoded_token['email'])
+        if user is None:
+            return None
+
+        identity = {
+            'id': user['id'],
+            'email': decoded_token['email'],
+            'uid': decoded_token['uid'],
+            'role': user['role'],
+            'expires_at': decoded_token.get('exp', 0),
+        }
+        with self._lock:
+            self._sessions[sid] = identity
+        return identity
+
+    def get(self, sid):
+        """Return the stored identity, or None if there is none or it has expired."""
+        with self._lock:
+            identity = self._sessions.get(sid)
+            if identity is None:
+                return None
+            if identity['expires_at'] <= time.time():
+                del self._sessions[sid]
+                self.stats['expired'] += 1
+                return None
+        self.stats['session_hits'] += 1
+        return identity
+
+    def close(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def revoke(self, email=None, uid=None):
+        """Drop every session that belongs to the given user."""
+        with self._lock:
+            stale = [
+                sid for sid, identity in self._sessions.items()
+                if (email and identity['email'] == email) or (uid and identity['uid'] == uid)
+            ]
+            for sid in stale:
+                del self._sessions[sid]
+        self.stats['revoked'] += len(stale)
+        return len(stale)
+
+
+socket_sessions = SocketSessions()
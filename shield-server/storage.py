@@ -0,0 +1,160 @@
+from abc import ABC, abstractmethod
+import config
+
+# Storage layer: the repositories the server reads and writes its records
+# through. `storage` is built from STORAGE_BACKEND: 'firestore'
+# (storage_firestore, the live project) or 'memory' (storage_memory, a
+# process-local store with simulated round-trip latency, for offline
+# benchmarks and load tests). Records are plain dicts carrying their document
+# id as 'id'. Writes may use the Firestore SERVER_TIMESTAMP and Increment
+# sentinels; both backends resolve them.
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+
+def grant_expired(user, now):
+    """True if the user still holds a secure-route grant whose stored deadline has passed (or was never set)."""
+    if not user.get('canAccessSecureRoute'):
+        return False
+    expires_at = user.get('accessExpiresAt')
+    return expires_at is None or expires_at <= now
+
+
+class UsersRepository(ABC):
+    """The `users` collection."""
+
+    collection = 'users'
+
+    @abstractmethod
+    def get(self, user_id):
+        """The user stored under `user_id`, or None."""
+
+    @abstractmethod
+    def find_by_email(self, email):
+        """The user registered with `email`, or None."""
+
+    @abstractmethod
+    def list(self, role=None):
+        """Every user, or those with the given role."""
+
+    @abstractmethod
+    def with_secure_access(self):
+        """Users whose `canAccessSecureRoute` flag is set."""
+
+    @abstractmethod
+    def new_id(self):
+        """A fresh document id."""
+
+    @abstractmethod
+    def create(self, user_id, data):
+        ...
+
+    @abstractmethod
+    def update(self, user_id, fields):
+        """Update fields of an existing user (fails if there is none)."""
+
+    @abstractmethod
+    def update_many(self, user_ids, fields):
+        """Set the same fields on several users in as few writes as possible; return how many were updated.
+
+        Users that no longer exist are skipped.
+        """
+
+    @abstractmethod
+    def revoke_expired_access(self, user_ids, now):
+        """Clear `canAccessSecureRoute` of those users whose grant expired by `now`; return how many.
+
+        Each user's stored `accessExpiresAt` is checked and written
+        atomically, so a grant renewed after its old deadline was taken is
+        kept. Missing users are skipped.
+        """
+
+    @abstractmethod
+    def delete(self, user_id):
+        ...
+
+    @abstractmethod
+    def move(self, old_id, new_id, fields):
+        """Atomically copy a user under a new id with `fields` applied, and delete the original.
+
+        If the original is already gone (moved by someone else), only
+        `fields` are applied to the new document, which must then exist.
+        """
+
+    @abstractmethod
+    def watch(self, callback):
+        """Call `callback(users, changes)` as the collection changes; return a handle with `unsubscribe()`.
+
+        The first call has `users`, every user keyed by id, and no changes.
+        Later calls have `users` None and `changes`, a list of
+        (user_id, user or None if deleted, commit time).
+        """
+
+
+class AuthorizationLogsRepository(ABC):
+    """The `authorization_logs` collection and the analytics counter documents derived from it."""
+
+    collection = 'authorization_logs'
+
+    @abstractmethod
+    def page(self, email=None, authorized=None, since=None, until=None, descending=True, after=None, limit=100):
+        """Logs in (timestamp, id) order, filtered, starting after the (timestamp, id) `after`.
+
+        Returns an iterator; the first log is fetched before returning so
+        query errors are raised here.
+        """
+
+    @abstractmethod
+    def counter(self, collection, doc_id):
+        """A counter document, or None."""
+
+    @abstractmethod
+    def counter_range(self, collection, start_id, end_id):
+        """Counter documents with start_id <= id < end_id, in id order."""
+
+    @abstractmethod
+    def top_counters(self, collection, field, limit):
+        """The `limit` counter documents with the highest `field`."""
+
+
+class Storage(ABC):
+    """A backend's repositories, plus the batched write path used by the audit writer.
+
+    `write_batch` takes (collection, doc_id or None for a generated id, data,
+    merge) writes and commits them together, atomically. Authorization logs,
+    trained-faces records and analytics counters are written only this way.
+    """
+
+    users = None
+    authorization_logs = None
+
+    @abstractmethod
+    def write_batch(self, writes):
+        ...
+
+    @abstractmethod
+    def exists(self, collection, doc_id):
+        """True if the document is stored (used to tell whether a failed batch commit landed)."""
+
+    def stats(self):
+        return {}
+
+
+def create_storage(backend=None, latency_ms=None, jitter_ms=None):
+    backend = backend or config.STORAGE_BACKEND
+    if backend == 'memory':
+        from storage_memory import MemoryStorage
+        return MemoryStorage(
+            latency_ms=config.STORAGE_LATENCY_MS if latency_ms is None else latency_ms,
+            jitter_ms=config.STORAGE_LATENCY_JITTER_MS if jitter_ms is None else jitter_ms
+        )
+    if backend == 'firestore':
+        # Only the Firestore backend needs the service account and a connection
+        from storage_firestore import FirestoreStorage
+        from firebase_service import db
+        return FirestoreStorage(db)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+storage = create_storage()
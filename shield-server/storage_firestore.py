@@ -0,0 +1,210 @@
+import logging
+from firebase_admin import firestore
+from firebase_admin.firestore import FieldFilter
+from storage import MAX_BATCH_WRITES, AuthorizationLogsRepository, Storage, UsersRepository, grant_expired
+
+logger = logging.getLogger(__name__)
+
+
+def _record(doc):
+    return {**doc.to_dict(), 'id': doc.id}
+
+
+@firestore.transactional
+def _move(transaction, old_ref, new_ref, fields):
+    # Read the original inside the transaction so the copy can't miss a concurrent write
+    snapshot = old_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        if fields:
+            transaction.update(new_ref, fields)
+        return
+    transaction.set(new_ref, {**snapshot.to_dict(), **fields})
+    transaction.delete(old_ref)
+
+
+@firestore.transactional
+def _revoke_if_expired(transaction, ref, now):
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists or not grant_expired(snapshot.to_dict(), now):
+        return False
+    transaction.update(ref, {'canAccessSecureRoute': False})
+    return True
+
+
+class FirestoreUsers(UsersRepository):
+
+    def __init__(self, db):
+        self._db = db
+        self._ref = db.collection(self.collection)
+
+    def get(self, user_id):
+        doc = self._ref.document(user_id).get()
+        return _record(doc) if doc.exists else None
+
+    def find_by_email(self, email):
+        docs = self._ref.where(filter=FieldFilter('email', '==', email)).limit(1).get()
+        return _record(docs[0]) if len(docs) else None
+
+    def list(self, role=None):
+        query = self._ref
+        if role is not None:
+            query = query.where(filter=FieldFilter('role', '==', role))
+        return [_record(doc) for doc in query.stream()]
+
+    def with_secure_access(self):
+        return [_record(doc) for doc in self._ref.where(filter=FieldFilter('canAccessSecureRoute', '==', True)).stream()]
+
+    def new_id(self):
+        return self._ref.document().id
+
+    def create(self, user_id, data):
+        self._ref.document(user_id).set(data)
+
+    def update(self, user_id, fields):
+        self._ref.document(user_id).update(fields)
+
+    def update_many(self, user_ids, fields):
+        updated = 0
+        for start in range(0, len(user_ids), MAX_BATCH_WRITES):
+            chunk = user_ids[start:start + MAX_BATCH_WRITES]
+            try:
+                batch = self._db.batch()
+                for user_id in chunk:
+                    batch.update(self._ref.document(user_id), fields)
+                batch.commit()
+                updated += len(chunk)
+            except Exception:
+                # One missing document (a user deleted meanwhile) fails the
+                # whole batch, so write them one by one
+                for user_id in chunk:
+                    try:
+                        self._ref.document(user_id).update(fields)
+                        updated += 1
+                    except Exception as e:
+                        logger.warning(f"Error updating user {user_id}: {str(e)}")
+        return updated
+
+    def revoke_expired_access(self, user_ids, now):
+        revoked = 0
+        for start in range(0, len(user_ids), MAX_BATCH_WRITES):
+            refs = [self._ref.document(user_id) for user_id in user_ids[start:start + MAX_BATCH_WRITES]]
+            due = [doc for doc in self._db.get_all(refs) if doc.exists and grant_expired(doc.to_dict(), now)]
+            if not due:
+                continue
+            try:
+                # Each write requires the document to be unchanged since it was read
+                batch = self._db.batch()
+                for doc in due:
+                    batch.update(
+                        doc.reference, {'canAccessSecureRoute': False},
+                        option=self._db.write_option(last_update_time=doc.update_time)
+                    )
+                batch.commit()
+                revoked += len(due)
+            except Exception:
+                # Some user changed meanwhile (a renewed grant, a deletion), so check them one by one
+                for doc in due:
+                    try:
+                        revoked += _revoke_if_expired(self._db.transaction(), doc.reference, now)
+                    except Exception as e:
+                        logger.warning(f"Error revoking the secure access of {doc.id}: {str(e)}")
+        return revoked
+
+    def delete(self, user_id):
+        self._ref.document(user_id).delete()
+
+    def move(self, old_id, new_id, fields):
+        _move(self._db.transaction(), self._ref.document(old_id), self._ref.document(new_id), fields)
+
+    def watch(self, callback):
+        # A listener's first snapshot holds the whole collection; later ones carry only the changes
+        first = [True]
+
+        def on_snapshot(docs, changes, read_time):
+            if first[0]:
+                first[0] = False
+                callback({doc.id: _record(doc) for doc in docs}, [])
+                return
+            callback(None, [
+                (
+                    change.document.id,
+                    None if change.type.name == 'REMOVED' else _record(change.document),
+                    change.document.update_time or read_time,
+                )
+                for change in changes
+            ])
+
+        return self._ref.on_snapshot(on_snapshot)
+
+
+class FirestoreAuthorizationLogs(AuthorizationLogsRepository):
+
+    def __init__(self, db):
+        self._db = db
+        self._ref = db.collection(self.collection)
+
+    def page(self, email=None, authorized=None, since=None, until=None, descending=True, after=None, limit=100):
+        query = self._ref
+        if email is not None:
+            query = query.where(filter=FieldFilter('user_email', '==', email))
+        if authorized is not None:
+            query = query.where(filter=FieldFilter('authorized', '==', authorized))
+        if since is not None:
+            query = query.where(filter=FieldFilter('timestamp', '>=', since))
+        if until is not None:
+            query = query.where(filter=FieldFilter('timestamp', '<', until))
+
+        # The document id breaks ties between logs written in the same instant.
+        # Filter combinations need the composite indexes in firestore.indexes.json.
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = query.order_by('timestamp', direction=direction).order_by('__name__', direction=direction)
+        if after is not None:
+            timestamp, doc_id = after
+            query = query.start_after({'timestamp': timestamp, '__name__': self._ref.document(doc_id)})
+
+        docs = query.limit(limit).stream()
+        first = next(docs, None)
+        return self._records(first, docs)
+
+    def _records(self, first, docs):
+        if first is None:
+            return
+        yield _record(first)
+        for doc in docs:
+            yield _record(doc)
+
+    def counter(self, collection, doc_id):
+        doc = self._db.collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def counter_range(self, collection, start_id, end_id):
+        # Counter documents named by their key, so the range is a document id range
+        ref = self._db.collection(collection)
+        query = (
+            ref
+            .where(filter=FieldFilter('__name__', '>=', ref.document(start_id)))
+            .where(filter=FieldFilter('__name__', '<', ref.document(end_id)))
+        )
+        return [doc.to_dict() for doc in query.stream()]
+
+    def top_counters(self, collection, field, limit):
+        query = self._db.collection(collection).order_by(field, direction=firestore.Query.DESCENDING).limit(limit)
+        return [doc.to_dict() for doc in query.stream()]
+
+
+class FirestoreStorage(Storage):
+
+    def __init__(self, db):
+        self._db = db
+        self.users = FirestoreUsers(db)
+        self.authorization_logs = FirestoreAuthorizationLogs(db)
+
+    def write_batch(self, writes):
+        batch = self._db.batch()
+        for collection, doc_id, data, merge in writes:
+            # document(None) generates an id, like collection.add()
+            batch.set(self._db.collection(collection).document(doc_id), data, merge=merge)
+        batch.commit()
+
+    def exists(self, collection, doc_id):
+        return self._db.collection(collection).document(doc_id).get().exists
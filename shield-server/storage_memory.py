@@ -0,0 +1,291 @@
+import copy
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from firebase_admin import firestore
+from storage import MAX_BATCH_WRITES, AuthorizationLogsRepository, Storage, UsersRepository, grant_expired
+
+
+class MemoryStore:
+    """Collections of documents in process memory, with a simulated round trip per call.
+
+    Every repository call that would be one Firestore request sleeps
+    `latency_ms` plus up to `jitter_ms` (from a seeded generator, so runs are
+    repeatable) outside the lock, then applies its reads or writes
+    atomically. Write sentinels are resolved as Firestore does:
+    SERVER_TIMESTAMP becomes the commit time, Increment adds to the stored
+    number, and merged maps are merged key by key.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, seed=0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self._random = random.Random(seed)
+        self._collections = {}
+        self._lock = threading.RLock()
+        self._watchers = {}
+        self._stats = {'round_trips': 0, 'reads': 0, 'writes': 0, 'simulated_wait_s': 0.0}
+
+    def round_trip(self):
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            self._stats['round_trips'] += 1
+            self._stats['simulated_wait_s'] += delay
+        if delay:
+            time.sleep(delay)
+
+    def collection(self, name):
+        return self._collections.setdefault(name, {})
+
+    def read(self, name, doc_id):
+        """A copy of a document with its 'id', or None (call with the lock held)."""
+        self._stats['reads'] += 1
+        data = self.collection(name).get(doc_id)
+        return {**copy.deepcopy(data), 'id': doc_id} if data is not None else None
+
+    def scan(self, name, predicate=None):
+        """Copies of the documents matching `predicate` (call with the lock held)."""
+        documents = self.collection(name)
+        self._stats['reads'] += len(documents)
+        return [
+            {**copy.deepcopy(data), 'id': doc_id}
+            for doc_id, data in documents.items()
+            if predicate is None or predicate(data)
+        ]
+
+    def commit(self, writes):
+        """Apply (collection, doc_id, data or None to delete, merge) writes atomically and notify watchers.
+
+        `writes` may be a function returning them, called with the lock held,
+        for writes that depend on what is stored.
+        """
+        now = datetime.now(timezone.utc)
+        notifications = []
+        with self._lock:
+            for name, doc_id, data, merge in (writes() if callable(writes) else writes):
+                documents = self.collection(name)
+                doc_id = doc_id or uuid.uuid4().hex[:20]
+                if data is None:
+                    documents.pop(doc_id, None)
+                else:
+                    current = documents.get(doc_id, {}) if merge else {}
+                    documents[doc_id] = _resolve(copy.deepcopy(current), data, now)
+                self._stats['writes'] += 1
+                stored = documents.get(doc_id)
+                for callback in self._watchers.get(name, []):
+                    notifications.append((callback, doc_id, {**copy.deepcopy(stored), 'id': doc_id} if stored else None))
+        # Watchers are called on the writer's thread, after the commit
+        for callback, doc_id, record in notifications:
+            callback(None, [(doc_id, record, now)])
+
+    def watch(self, name, callback):
+        # The first call is made under the lock so no change can overtake it
+        with self._lock:
+            self._watchers.setdefault(name, []).append(callback)
+            callback({record['id']: record for record in self.scan(name)}, [])
+        store = self
+
+        class Handle:
+            def unsubscribe(self):
+                with store._lock:
+                    store._watchers[name].remove(callback)
+
+        return Handle()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['simulated_wait_s'] = round(stats['simulated_wait_s'], 3)
+            stats['documents'] = {name: len(documents) for name, documents in self._collections.items()}
+        return stats
+
+
+def _resolve(current, data, now):
+    for field, value in data.items():
+        if value is firestore.SERVER_TIMESTAMP:
+            current[field] = now
+        elif isinstance(value, firestore.Increment):
+            current[field] = (current.get(field) or 0) + value.value
+        elif isinstance(value, dict):
+            nested = current.get(field)
+            current[field] = _resolve(nested if isinstance(nested, dict) else {}, value, now)
+        else:
+            current[field] = copy.deepcopy(value)
+    return current
+
+
+class MemoryUsers(UsersRepository):
+
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, user_id):
+        self._store.round_trip()
+        with self._store._lock:
+            return self._store.read(self.collection, user_id)
+
+    def find_by_email(self, email):
+        self._store.round_trip()
+        with self._store._lock:
+            users = self._store.scan(self.collection, lambda user: user.get('email') == email)
+        return users[0] if users else None
+
+    def list(self, role=None):
+        self._store.round_trip()
+        with self._store._lock:
+            return self._store.scan(self.collection, lambda user: role is None or user.get('role') == role)
+
+    def with_secure_access(self):
+        self._store.round_trip()
+        with self._store._lock:
+            return self._store.scan(self.collection, lambda user: user.get('canAccessSecureRoute') is True)
+
+    def new_id(self):
+        # Generated locally, like Firestore's document().id
+        return uuid.uuid4().hex[:20]
+
+    def create(self, user_id, data):
+        self._store.round_trip()
+        self._store.commit([(self.collection, user_id, data, False)])
+
+    def update(self, user_id, fields):
+        def writes():
+            if user_id not in self._store.collection(self.collection):
+                raise KeyError(f"No user {user_id}")
+            return [(self.collection, user_id, fields, True)]
+
+        self._store.round_trip()
+        self._store.commit(writes)
+
+    def update_many(self, user_ids, fields):
+        updated = []
+
+        def writes(chunk):
+            existing = self._store.collection(self.collection)
+            chunk = [user_id for user_id in chunk if user_id in existing]
+            updated.extend(chunk)
+            return [(self.collection, user_id, fields, True) for user_id in chunk]
+
+        for start in range(0, len(user_ids), MAX_BATCH_WRITES):
+            self._store.round_trip()
+            self._store.commit(lambda: writes(user_ids[start:start + MAX_BATCH_WRITES]))
+        return len(updated)
+
+    def revoke_expired_access(self, user_ids, now):
+        revoked = []
+
+        def writes(chunk):
+            documents = self._store.collection(self.collection)
+            chunk = [user_id for user_id in chunk if user_id in documents and grant_expired(documents[user_id], now)]
+            revoked.extend(chunk)
+            return [(self.collection, user_id, {'canAccessSecureRoute': False}, True) for user_id in chunk]
+
+        for start in range(0, len(user_ids), MAX_BATCH_WRITES):
+            # The read of the deadlines, then the conditional commit
+            self._store.round_trip()
+            self._store.round_trip()
+            self._store.commit(lambda: writes(user_ids[start:start + MAX_BATCH_WRITES]))
+        return len(revoked)
+
+    def delete(self, user_id):
+        self._store.round_trip()
+        self._store.commit([(self.collection, user_id, None, False)])
+
+    def move(self, old_id, new_id, fields):
+        def writes():
+            documents = self._store.collection(self.collection)
+            original = documents.get(old_id)
+            if original is None:
+                # An update, as in Firestore: the moved document must exist
+                if not fields:
+                    return []
+                if new_id not in documents:
+                    raise KeyError(f"No user {new_id}")
+                return [(self.collection, new_id, fields, True)]
+            return [
+                (self.collection, new_id, {**copy.deepcopy(original), **fields}, False),
+                (self.collection, old_id, None, False),
+            ]
+
+        # A transaction: the read, then the commit
+        self._store.round_trip()
+        self._store.round_trip()
+        self._store.commit(writes)
+
+    def watch(self, callback):
+        self._store.round_trip()
+        return self._store.watch(self.collection, callback)
+
+
+class MemoryAuthorizationLogs(AuthorizationLogsRepository):
+
+    def __init__(self, store):
+        self._store = store
+
+    def page(self, email=None, authorized=None, since=None, until=None, descending=True, after=None, limit=100):
+        def matches(log):
+            return (
+                (email is None or log.get('user_email') == email)
+                and (authorized is None or log.get('authorized') == authorized)
+                and (since is None or log['timestamp'] >= since)
+                and (until is None or log['timestamp'] < until)
+            )
+
+        def key(item):
+            return item[1]['timestamp'], item[0]
+
+        self._store.round_trip()
+        with self._store._lock:
+            # Sort the stored documents and copy only the page
+            logs = sorted(
+                (item for item in self._store.collection(self.collection).items() if matches(item[1])),
+                key=key, reverse=descending
+            )
+            if after is not None:
+                after = tuple(after)
+                logs = [item for item in logs if (key(item) < after if descending else key(item) > after)]
+            page = [self._store.read(self.collection, doc_id) for doc_id, _ in logs[:limit]]
+        return iter(page)
+
+    def counter(self, collection, doc_id):
+        self._store.round_trip()
+        with self._store._lock:
+            counts = self._store.read(collection, doc_id)
+        if counts is not None:
+            counts.pop('id')
+        return counts
+
+    def counter_range(self, collection, start_id, end_id):
+        self._store.round_trip()
+        with self._store._lock:
+            documents = self._store.collection(collection)
+            ids = sorted(doc_id for doc_id in documents if start_id <= doc_id < end_id)
+            return [copy.deepcopy(documents[doc_id]) for doc_id in ids]
+
+    def top_counters(self, collection, field, limit):
+        self._store.round_trip()
+        with self._store._lock:
+            documents = [copy.deepcopy(counts) for counts in self._store.collection(collection).values() if field in counts]
+        return sorted(documents, key=lambda counts: counts[field], reverse=True)[:limit]
+
+
+class MemoryStorage(Storage):
+
+    def __init__(self, latency_ms=0, jitter_ms=0, seed=0):
+        self.store = MemoryStore(latency_ms, jitter_ms, seed)
+        self.users = MemoryUsers(self.store)
+        self.authorization_logs = MemoryAuthorizationLogs(self.store)
+
+    def write_batch(self, writes):
+        self.store.round_trip()
+        self.store.commit(writes)
+
+    def exists(self, collection, doc_id):
+        self.store.round_trip()
+        with self.store._lock:
+            return doc_id in self.store.collection(collection)
+
+    def stats(self):
+        return self.store.stats()
@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingJobQueue:
+    """Enrollment training jobs run by one background worker.
+
+    Finishing a capture only enqueues a job. Jobs for a user that is already
+    waiting are deduplicated, and every job waiting when the worker wakes up is
+    trained together as one model update. `train_batch(jobs, progress)` does
+    the work and returns {face_id: result or Exception}; `notify(job, event,
+    payload)` forwards progress and completion events to the job's room.
+    """
+
+    def __init__(self, max_batch=16, history=1000):
+        self.max_batch = max_batch
+        self.history = history
+        self._jobs = OrderedDict()
+        self._queued = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._train_batch = None
+        self._notify = None
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'batches': 0, 'completed': 0, 'failed': 0, 'train_seconds': 0.0}
+
+    def start(self, train_batch, notify):
+        self._train_batch = train_batch
+        self._notify = notify
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='training-worker', daemon=True)
+            self._thread.start()
+
+    def submit(self, face_id, requested_by, samples=None, on_queued=None):
+        """Queue training for a user, or return the job already waiting for them.
+
+        `samples` are the captured crops to train on; without them the trainer
+        reads the user's dataset. A newer capture replaces a waiting job's crops.
+        `on_queued(job)` runs before the worker can pick the job up, so a
+        client can join the job's room without missing its first events.
+        """
+        with self._cond:
+            job = self._queued.get(face_id)
+            if job is not None:
+                self._stats['deduplicated'] += 1
+                if samples is not None:
+                    job['samples'] = samples
+                if on_queued:
+                    on_queued(job)
+                return job
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'face_id': face_id,
+                'requested_by': requested_by,
+                'state': 'queued',
+                'stage': 'queued',
+                'progress': 0,
+                'error': None,
+                'result': None,
+                'batch_size': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'samples': samples,
+            }
+            if on_queued:
+                on_queued(job)
+            self._jobs[job['id']] = job
+            self._queued[face_id] = job
+            self._stats['submitted'] += 1
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def find(self, face_id):
+        """Jobs of a user, newest first."""
+        with self._cond:
+            return [dict(job) for job in reversed(self._jobs.values()) if job['face_id'] == face_id]
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queued'] = len(self._queued)
+        batches = stats['batches']
+        stats['avg_batch_size'] = round((stats['completed'] + stats['failed']) / batches, 2) if batches else 0
+        stats['avg_batch_ms'] = round(1000 * stats.pop('train_seconds') / batches, 1) if batches else 0
+        return stats
+
+    def progress(self, job, stage, progress):
+        job['stage'] = stage
+        job['progress'] = progress
+        self._emit(job, 'training_progress', {
+            'jobId': job['id'],
+            'stage': stage,
+            'progress': progress,
+        })
+
+    def _emit(self, job, event, payload):
+        # A client that went away must not stop the worker
+        try:
+            self._notify(job, event, payload)
+        except Exception as e:
+            logger.warning(f"Could not send {event} for job {job['id']}: {str(e)}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queued:
+                    self._cond.wait()
+                # Everything waiting now goes into one model update
+                batch = []
+                while self._queued and len(batch) < self.max_batch:
+                    batch.append(self._queued.popitem(last=False)[1])
+                for job in batch:
+                    job['state'] = 'running'
+                    job['started_at'] = time.time()
+                    job['batch_size'] = len(batch)
+
+            started = time.perf_counter()
+            try:
+                results = self._train_batch(batch, self.progress)
+            except Exception as e:
+                logger.error(f"Training batch failed: {str(e)}")
+                results = {job['face_id']: e for job in batch}
+            self._stats['batches'] += 1
+            self._stats['train_seconds'] += time.perf_counter() - started
+
+            for job in batch:
+                result = results.get(job['face_id'])
+                job['finished_at'] = time.time()
+                job['samples'] = None
+                if isinstance(result, Exception) or result is None:
+                    self._stats['failed'] += 1
+                    job['state'] = 'failed'
+                    job['error'] = str(result) if result is not None else "Job was not trained"
+                    self._emit(job, 'training_error', {
+                        'jobId': job['id'],
+                        'status': "Training failed",
+                        'error': job['error']
+                    })
+                else:
+                    self._stats['completed'] += 1
+                    job['state'] = 'completed'
+                    job['result'] = result
+                    job['progress'] = 100
+                    self._emit(job, 'training_completed', result)
+
+
+training_jobs = TrainingJobQueue(max_batch=config.TRAINING_MAX_BATCH)
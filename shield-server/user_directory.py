@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from metrics import percentiles
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class UserDirectory:
+    """Process-local mirror of the users repository, indexed by document id, email and Firebase uid.
+
+    The collection is loaded by the first call of a `watch` listener and
+    kept current by its change events, so lookups and listings are
+    dictionary reads. Handlers write user documents inside `writing(doc_id,
+    email=...)`; until the listener delivers that document, reads touching
+    it go to the repository, so a writer always reads its own writes. If an
+    expected write is not delivered within `max_lag` seconds the listener is
+    considered behind: every read falls back to the repository and the
+    listener is restarted.
+    """
+
+    def __init__(self, max_lag=5.0):
+        self.max_lag = max_lag
+        self._users = None
+        self._watch = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._by_id = {}
+        self._by_email = {}
+        self._by_uid = {}
+        # doc id -> (email, monotonic time of the write) for writes not yet mirrored
+        self._pending = {}
+        # doc id -> monotonic time its last change was delivered
+        self._delivered = {}
+        self._last_snapshot = None
+        self._last_restart = 0.0
+        self._lag_seconds = deque(maxlen=1000)
+        self._stats = {
+            'snapshots': 0, 'changes': 0, 'mirror_reads': 0, 'fallback_reads': 0,
+            'behind': 0, 'restarts': 0,
+        }
+
+    def start(self, users):
+        self._users = users
+        if self._watch is None:
+            self._listen()
+
+    def _listen(self):
+        # Callbacks of a replaced listener are ignored by generation
+        self._generation += 1
+        generation = self._generation
+        self._watch = self._users.watch(lambda users, changes: self._on_snapshot(generation, users, changes))
+
+    def _restart(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._users is None or now - self._last_restart < self.max_lag:
+                return
+            self._last_restart = now
+            self._stats['restarts'] += 1
+        logger.warning("User directory listener is behind, restarting it")
+        try:
+            self._watch.unsubscribe()
+        except Exception as e:
+            logger.error(f"Error stopping user directory listener: {str(e)}")
+        self._listen()
+
+    def _on_snapshot(self, generation, users, changes):
+        # Runs on the listener's thread: first the whole collection, then changes
+        received = datetime.now(timezone.utc)
+        delivered = time.monotonic()
+        with self._lock:
+            if generation != self._generation:
+                return
+            if users is not None:
+                self._by_id.clear()
+                self._by_email.clear()
+                self._by_uid.clear()
+                for user in users.values():
+                    self._put(user)
+                self._pending.clear()
+            for doc_id, user, committed in changes:
+                self._remove(doc_id)
+                if user is not None:
+                    self._put(user)
+                self._pending.pop(doc_id, None)
+                self._delivered[doc_id] = delivered
+                # Time from the write being committed to this process seeing it
+                self._lag_seconds.append(max((received - committed).total_seconds(), 0.0))
+            self._stats['changes'] += len(changes)
+            self._stats['snapshots'] += 1
+            self._last_snapshot = delivered
+        self._ready.set()
+
+    def _put(self, user):
+        self._by_id[user['id']] = user
+        if user.get('email'):
+            self._by_email[user['email']] = user
+        # Documents are moved under the Firebase uid on login; until then the uid field says where it is
+        self._by_uid[user.get('uid', user['id'])] = user
+
+    def _remove(self, doc_id):
+        user = self._by_id.pop(doc_id, None)
+        if user and self._by_email.get(user.get('email')) is user:
+            del self._by_email[user['email']]
+        if user and self._by_uid.get(user.get('uid', doc_id)) is user:
+            del self._by_uid[user.get('uid', doc_id)]
+
+    @contextmanager
+    def writing(self, *doc_ids, email=None):
+        """Wrap a write of user documents: once it succeeds, reads of them skip the mirror until it catches up."""
+        started = time.monotonic()
+        yield
+        with self._lock:
+            for doc_id in doc_ids:
+                # The listener may have delivered it already (in-process backends always do)
+                if self._delivered.get(doc_id, 0) < started:
+                    self._pending[doc_id] = (email, time.monotonic())
+
+    def is_current(self, doc_id=None, email=None):
+        """True if reads of the given user (or of any user) can be served from the mirror."""
+        if not self._ready.is_set():
+            return False
+        now = time.monotonic()
+        with self._lock:
+            behind = any(now - written > self.max_lag for _, written in self._pending.values())
+            touched = any(
+                pending_id == doc_id or (email and pending_email == email) or (doc_id is None and email is None)
+                for pending_id, (pending_email, _) in self._pending.items()
+            )
+            if behind:
+                self._stats['behind'] += 1
+        if behind:
+            self._restart()
+        return not behind and not touched
+
+    def _count(self, mirrored):
+        with self._lock:
+            self._stats['mirror_reads' if mirrored else 'fallback_reads'] += 1
+
+    def by_id(self, doc_id):
+        """The user stored under `doc_id` (with its 'id'), or None."""
+        if self.is_current(doc_id=doc_id):
+            self._count(True)
+            with self._lock:
+                user = self._by_id.get(doc_id)
+            return dict(user) if user else None
+
+        self._count(False)
+        return self._users.get(doc_id)
+
+    def by_uid(self, uid):
+        """The user whose Firebase uid is `uid`, if its document is keyed or tagged by it, or None."""
+        if self.is_current(doc_id=uid):
+            self._count(True)
+            with self._lock:
+                user = self._by_uid.get(uid)
+            return dict(user) if user else None
+
+        self._count(False)
+        return self._users.get(uid)
+
+    def by_email(self, email):
+        """The user registered with `email` (with its document 'id'), or None."""
+        if self.is_current(email=email):
+            self._count(True)
+            with self._lock:
+                user = self._by_email.get(email)
+            return dict(user) if user else None
+
+        self._count(False)
+        return self._users.find_by_email(email)
+
+    def list(self, role=None):
+        """Every user, or those with the given role."""
+        if self.is_current():
+            self._count(True)
+            with self._lock:
+                return [dict(user) for user in self._by_id.values() if role is None or user.get('role') == role]
+
+        self._count(False)
+        return self._users.list(role)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['ready'] = self._ready.is_set()
+            stats['users'] = len(self._by_id)
+            stats['pending_writes'] = len(self._pending)
+            stats['oldest_pending_s'] = round(max((now - written for _, written in self._pending.values()), default=0), 2)
+            stats['since_last_snapshot_s'] = round(now - self._last_snapshot, 1) if self._last_snapshot else None
+            stats['lag_ms'] = percentiles(list(self._lag_seconds))
+        return stats
+
+
+user_directory = UserDirectory(max_lag=config.USER_DIRECTORY_MAX_LAG)
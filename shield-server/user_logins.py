@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+from firebase_admin import firestore
+from metrics import percentiles
+
+
+def login_changes(user, decoded_token):
+    """Fields a login sets on the user's document, minus those that already hold that value."""
+    fields = {
+        'isValidated': True,
+        'name': decoded_token.get('name', user.get('name', '')),
+        'photoURL': decoded_token.get('picture', user.get('photoURL', '')),
+    }
+    return {field: value for field, value in fields.items() if user.get(field) != value}
+
+
+def needs_write(user, decoded_token):
+    """True if a login has to write the user's document."""
+    return user['id'] != decoded_token['uid'] or bool(login_changes(user, decoded_token))
+
+
+def record_login(users, user, decoded_token):
+    """Write what a login changes on the user's document; return the number of storage round trips.
+
+    Nothing is written when the profile is unchanged and the document is
+    already keyed by the Firebase uid. Otherwise it is one update, or for a
+    document still under its admin-created id, one transactional move under
+    the uid, so a crash can't leave both.
+    """
+    if not needs_write(user, decoded_token):
+        return 0
+    uid = decoded_token['uid']
+    changes = login_changes(user, decoded_token)
+    changes['updatedAt'] = firestore.SERVER_TIMESTAMP
+    if user['id'] == uid:
+        users.update(uid, changes)
+        return 1
+
+    users.move(user['id'], uid, {**changes, 'uid': uid, 'id': uid})
+    # The transactional read, then the commit
+    return 2
+
+
+class LoginStats:
+    """Storage round trips and latency of `verify_user` logins."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds = deque(maxlen=1000)
+        self._stats = {'logins': 0, 'firestore_calls': 0, 'unchanged': 0, 'updated': 0, 'moved': 0}
+
+    def record(self, writes, calls, seconds):
+        """Count one login: `writes` as returned by record_login, `calls` including lookups."""
+        with self._lock:
+            self._stats['logins'] += 1
+            self._stats['firestore_calls'] += calls
+            self._stats[('unchanged', 'updated', 'moved')[writes]] += 1
+            self._seconds.append(seconds)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['calls_per_login'] = round(stats['firestore_calls'] / stats['logins'], 2) if stats['logins'] else 0
+            stats['latency_ms'] = percentiles(list(self._seconds))
+        return stats
+
+
+login_stats = LoginStats()